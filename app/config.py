@@ -10,14 +10,96 @@ class Settings:
     MONGODB_URL: str = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
     DATABASE_NAME: str = os.getenv("DATABASE_NAME", "market_research")
 
+    # Logging: records below WARNING are kept with probability LOG_SAMPLE_RATE
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
     # CORS Configuration
     CORS_ORIGINS = [
         "http://localhost:3000",  # Next.js frontend in development
         # "https://your-production-frontend.vercel.app"  # Add your production URL later
     ]
 
+    # Competitor listing
+    COMPETITORS_PAGE_SIZE: int = int(os.getenv("COMPETITORS_PAGE_SIZE", "100"))
+    COMPETITORS_MAX_PAGE_SIZE: int = int(os.getenv("COMPETITORS_MAX_PAGE_SIZE", "1000"))
+    # Rows validated and written per bulk_write during bulk ingest
+    BULK_INGEST_CHUNK_SIZE: int = int(os.getenv("BULK_INGEST_CHUNK_SIZE", "1000"))
+
+    # Fitted change in market share (percentage points) over the requested
+    # window below which a competitor counts as stable
+    MARKET_SHARE_STABLE_THRESHOLD: float = float(os.getenv("MARKET_SHARE_STABLE_THRESHOLD", "0.5"))
+    # Trends use the finest of daily/weekly/monthly points that keeps each
+    # competitor's series within this many points
+    MARKET_SHARE_MAX_POINTS: int = int(os.getenv("MARKET_SHARE_MAX_POINTS", "370"))
+    ROLLUP_COMPACTION_INTERVAL_SECONDS: float = float(os.getenv("ROLLUP_COMPACTION_INTERVAL_SECONDS", "60"))
+
+    # Stored /market-analysis results expire after this many seconds
+    ANALYSIS_RESULT_TTL_SECONDS: int = int(os.getenv("ANALYSIS_RESULT_TTL_SECONDS", "86400"))
+
+    # Background analysis jobs
+    ANALYSIS_JOB_WORKERS: int = int(os.getenv("ANALYSIS_JOB_WORKERS", "4"))
+    ANALYSIS_JOB_TENANT_CONCURRENCY: int = int(os.getenv("ANALYSIS_JOB_TENANT_CONCURRENCY", "2"))
+    ANALYSIS_JOB_POLL_SECONDS: float = float(os.getenv("ANALYSIS_JOB_POLL_SECONDS", "1"))
+    # Running jobs not updated for this long, and queued jobs not started, are
+    # recovered on startup and then this often by every process
+    ANALYSIS_JOB_STALE_SECONDS: int = int(os.getenv("ANALYSIS_JOB_STALE_SECONDS", "600"))
+    # Running jobs refresh updated_at this often; keep it well below the stale age
+    ANALYSIS_JOB_HEARTBEAT_SECONDS: float = float(os.getenv("ANALYSIS_JOB_HEARTBEAT_SECONDS", "60"))
+
+    # Sentiment scoring: "lexicon" (no encode) or "embedding" (anchor classifier)
+    SENTIMENT_MODE: str = os.getenv("SENTIMENT_MODE", "lexicon")
+    # Optional "word<TAB>weight" file extending the built-in lexicon
+    SENTIMENT_LEXICON_PATH: str = os.getenv("SENTIMENT_LEXICON_PATH", "")
+
+    # Cross-worker coherence of in-memory competitor state: "auto" (change
+    # stream, polling on standalone servers), "change_stream", "poll" or "off"
+    COHERENCE_MODE: str = os.getenv("COHERENCE_MODE", "auto")
+    COHERENCE_POLL_SECONDS: float = float(os.getenv("COHERENCE_POLL_SECONDS", "2"))
+    # Polls re-read this much before the last change to tolerate clock skew
+    COHERENCE_POLL_OVERLAP_SECONDS: float = float(os.getenv("COHERENCE_POLL_OVERLAP_SECONDS", "5"))
+    COHERENCE_TOMBSTONE_TTL_SECONDS: int = int(os.getenv("COHERENCE_TOMBSTONE_TTL_SECONDS", "86400"))
+    # Competitor documents cached per worker while changes are followed; 0 disables
+    COMPETITOR_CACHE_SIZE: int = int(os.getenv("COMPETITOR_CACHE_SIZE", "10000"))
+
+    # Keyword statistics backfill: >1 worker tokenizes chunks in a process pool
+    KEYWORD_BACKFILL_WORKERS: int = int(os.getenv("KEYWORD_BACKFILL_WORKERS", "2"))
+    KEYWORD_BACKFILL_CHUNK_SIZE: int = int(os.getenv("KEYWORD_BACKFILL_CHUNK_SIZE", "5000"))
+
     # Model Settings
     EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # Lightweight model good for production
+    # Every model loaded once, in the background at startup, and shared by all services
+    EMBEDDING_MODELS = [
+        name.strip()
+        for name in os.getenv("EMBEDDING_MODELS", EMBEDDING_MODEL).split(",")
+        if name.strip()
+    ]
+    EMBEDDING_WARMUP: bool = os.getenv("EMBEDDING_WARMUP", "true").lower() == "true"
+    # Load models on a background thread at startup; otherwise on first encode
+    EMBEDDING_PRELOAD: bool = os.getenv("EMBEDDING_PRELOAD", "true").lower() == "true"
+    # Micro-batching of encodes across concurrent requests
+    EMBEDDING_MAX_BATCH_SIZE: int = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+    EMBEDDING_MAX_WAIT_MS: float = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+    EMBEDDING_WORKERS: int = int(os.getenv("EMBEDDING_WORKERS", "1"))
+    # In-memory LRU tier of the embedding cache, in entries
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "50000"))
+    # Persisted embedding encoding: "float32", "float16" or "int8" (BSON binary)
+    EMBEDDING_STORAGE: str = os.getenv("EMBEDDING_STORAGE", "float16")
+
+    # Nearest-competitor search: "exact" (brute force) or "ivf" (approximate)
+    VECTOR_INDEX_BACKEND: str = os.getenv("VECTOR_INDEX_BACKEND", "exact")
+    VECTOR_INDEX_NPROBE: int = int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+    # In-memory encoding searches and market analyses score against:
+    # "float32", "float16" or "int8" (a quarter of float32, scored as fast)
+    VECTOR_INDEX_STORAGE: str = os.getenv("VECTOR_INDEX_STORAGE", "int8")
+
+    # Market segmentation: mini-batch k-means over the competitor embeddings
+    SEGMENTATION_DEFAULT_SEGMENTS: int = int(os.getenv("SEGMENTATION_DEFAULT_SEGMENTS", "8"))
+    SEGMENTATION_BATCH_SIZE: int = int(os.getenv("SEGMENTATION_BATCH_SIZE", "1024"))
+    # Refit once this fraction of competitors changed since the last fit
+    SEGMENTATION_REFIT_FRACTION: float = float(os.getenv("SEGMENTATION_REFIT_FRACTION", "0.2"))
+    # Fitted segmentations (one per segment count) kept up to date per worker
+    SEGMENTATION_CACHED_MODELS: int = int(os.getenv("SEGMENTATION_CACHED_MODELS", "4"))
 
 
 settings = Settings()
\ No newline at end of file
@@ -1,6 +1,7 @@
 # app/database.py
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from .config import settings
+from .services.metrics import MongoCommandMetrics
 
 class Database:
     client: AsyncIOMotorClient = None
@@ -9,7 +10,11 @@ class Database:
     async def connect_to_database(self):
         """Create database connection."""
         try:
-            self.client = AsyncIOMotorClient(settings.MONGODB_URL)
+            # Listener feeds round-trip counts and latencies to /api/metrics
+            self.client = AsyncIOMotorClient(
+                settings.MONGODB_URL,
+                event_listeners=[MongoCommandMetrics()]
+            )
             self.db = self.client[settings.DATABASE_NAME]
             # Test the connection
             await self.client.admin.command('ping')
@@ -0,0 +1,44 @@
+# app/logging_config.py
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from .config import settings
+
+
+class SamplingFilter(logging.Filter):
+    """Keep every WARNING and above, and a random fraction of lower records"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+def configure_logging(level: Optional[str] = None, sample_rate: Optional[float] = None) -> QueueListener:
+    """Route the root logger through a queue so request handlers never block on I/O
+
+    Records are sampled and enqueued on the calling thread; formatting and
+    writing happen on the listener's thread. Returns the started listener,
+    which should be stopped on shutdown to flush it.
+    """
+    rate = settings.LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(rate))
+
+    output = logging.StreamHandler()
+    output.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level or settings.LOG_LEVEL)
+
+    listener = QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -1,15 +1,32 @@
 # app/main.py
-import logging
+import asyncio
+import time
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from .database import db
 from .config import settings
-from .routes import competitors, analysis
+from .logging_config import configure_logging
+from .responses import FastJSONResponse
+from .routes import competitors, analysis, mentions
+from .services.analysis_results import AnalysisResultStore
+from .services.competitor_service import CompetitorService
+from .services.job_queue import analysis_job_queue
+from .services.mention_service import MentionService
+from .services.market_share_service import MarketShareService, run_rollup_compaction
+from .services.model_registry import model_registry
+from .services.embedding_engine import embedding_engine
+from .services.embedding_cache import embedding_cache
+from .services.competitor_matrix import competitor_matrix
+from .services.coherence import competitor_changes
+from .services.keywords import keyword_engine
+from .services.metrics import metrics, observe_request
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    version=settings.PROJECT_VERSION
+    version=settings.PROJECT_VERSION,
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware
@@ -19,28 +36,84 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the browser client read the listing's pagination cursor
+    expose_headers=["X-Next-Cursor"],
 )
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+def route_template(request: Request):
+    """Matched route's path template, including the prefix it is mounted under"""
+    route = request.scope.get("route")
+    if route is None:
+        return None
+    # Included routers may report their own path without the include prefix;
+    # the prefix is whatever leading segments the template does not cover
+    segments = request.url.path.split("/")
+    covered = len(route.path.split("/")) - 1
+    return "/".join(segments[:len(segments) - covered]) + route.path
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template, not raw path, to keep label cardinality bounded
+    route = route_template(request)
+    observe_request(request.method, route, response.status_code, time.perf_counter() - started)
+    return response
+
+@app.on_event("startup")
+async def start_logging():
+    app.state.log_listener = configure_logging()
 
 @app.on_event("startup")
 async def startup_db_client():
     try:
         await db.connect_to_database()
+        embedding_cache.bind(db.get_database())
+        await CompetitorService(db.get_database()).ensure_indexes()
+        await MarketShareService(db.get_database()).ensure_indexes()
+        await AnalysisResultStore(db.get_database()).ensure_indexes()
+        await MentionService(db.get_database()).ensure_indexes()
     except Exception as e:
         print(f"Failed to connect to the database: {e}")
         raise e
 
+@app.on_event("startup")
+async def load_embedding_models():
+    embedding_engine.start()
+    # Models (and torch) load off the event loop so CRUD is served at once
+    if settings.EMBEDDING_PRELOAD:
+        asyncio.create_task(model_registry.warm_up(warmup=settings.EMBEDDING_WARMUP))
+    # Build the competitor embedding matrix without delaying startup
+    asyncio.create_task(
+        competitor_matrix.ensure_loaded(db.get_database().competitors)
+    )
+    asyncio.create_task(keyword_engine.ensure_loaded(db.get_database()))
+
+@app.on_event("startup")
+async def start_background_jobs():
+    analysis_job_queue.bind(db.get_database())
+    await analysis_job_queue.start()
+    competitor_changes.start(db.get_database())
+    app.state.background_tasks = [
+        asyncio.create_task(run_rollup_compaction(
+            db.get_database(), settings.ROLLUP_COMPACTION_INTERVAL_SECONDS
+        )),
+    ]
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in getattr(app.state, "background_tasks", []):
+        task.cancel()
+    await competitor_changes.stop()
+    await analysis_job_queue.stop()
+    await embedding_engine.stop()
     await db.close_database_connection()
+    app.state.log_listener.stop()
 
 # Include routers
 app.include_router(competitors.router, prefix="/api/competitors", tags=["competitors"])
 app.include_router(analysis.router, prefix="/api/analysis", tags=["analysis"])
+app.include_router(mentions.router, prefix="/api/mentions", tags=["mentions"])
 
 @app.get("/api/health")
 async def health_check():
@@ -49,11 +122,18 @@ async def health_check():
         return {
             "status": "healthy",
             "version": settings.PROJECT_VERSION,
-            "database": "connected"
+            "database": "connected",
+            "models": model_registry.stats(),
+            "coherence": competitor_changes.stats()
         }
     except Exception as e:
         return {
             "status": "unhealthy",
             "version": settings.PROJECT_VERSION,
             "database": f"disconnected: {str(e)}"
-        }
\ No newline at end of file
+        }
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of request, stage, encode and Mongo metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -20,6 +20,20 @@ class Competitor(CompetitorBase):
     created_at: datetime
     updated_at: datetime
 
+class CompetitorProjection(BaseModel):
+    """Competitor listing entry; only the projected fields are set"""
+    id: str
+    name: Optional[str] = None
+    website: Optional[str] = None
+    market_share: Optional[float] = None
+    price_range: Optional[str] = None
+    customer_count: Optional[str] = None
+    strengths: Optional[List[str]] = None
+    weaknesses: Optional[List[str]] = None
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 class Analysis(BaseModel):
     analysis_date: datetime
     market_positions: dict
@@ -32,6 +46,18 @@ class AnalysisRequest(BaseModel):
     end_date: datetime
     analysis_type: str = Field(description="Type of analysis: 'market_share', 'sentiment', or 'full'")
 
+class MarketShareSnapshot(BaseModel):
+    competitor_id: str
+    date: datetime
+    market_share: float = Field(ge=0, le=100)
+
+class MentionCreate(BaseModel):
+    competitor_id: str
+    text: str
+    published_at: datetime
+    source: Optional[str] = None
+    url: Optional[str] = None
+
 class MarketTrend(BaseModel):
     trend_name: str
     impact_score: float = Field(ge=-1, le=1)
@@ -0,0 +1,72 @@
+# app/responses.py
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Union
+
+import numpy as np
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MATRIX_ENCODINGS = ("json", "base64")
+
+
+def encode_matrix(matrix, encoding: str = "json") -> Union[np.ndarray, Dict]:
+    """Prepare a matrix for a response
+
+    ``json`` keeps it as a nested array. ``base64`` packs it as little-endian
+    float32, about half the size of the JSON digits; clients
+    decode it with e.g. ``np.frombuffer(b64decode(data), "<f4").reshape(shape)``.
+    """
+    if encoding not in MATRIX_ENCODINGS:
+        raise ValueError(f"Unknown matrix encoding: {encoding}. Use one of {', '.join(MATRIX_ENCODINGS)}")
+    if encoding == "json":
+        return np.asarray(matrix)
+    packed = np.ascontiguousarray(matrix, dtype="<f4")
+    return {
+        "encoding": "base64",
+        "dtype": "float32",
+        "shape": list(packed.shape),
+        "data": base64.b64encode(packed.tobytes()).decode("ascii"),
+    }
+
+
+def _default(obj: Any):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        # Views, float16 and object arrays are not handled natively
+        return obj.tolist()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(content, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, NumPy arrays included
+
+    Routes that already hold plain dicts (Mongo documents, analysis results)
+    return it directly, which skips FastAPI's response-model validation and
+    ``jsonable_encoder`` pass. orjson writes float32/float64 arrays natively;
+    without orjson installed the stdlib encoder is used.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
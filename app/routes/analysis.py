@@ -1,11 +1,14 @@
 # app/routes/analysis.py
 import logging
 
-from bson import ObjectId
-from fastapi import APIRouter, HTTPException, Body, Depends
-from typing import List
-from ..models.schemas import AnalysisRequest, Analysis, MarketTrend
+from fastapi import APIRouter, HTTPException, Body, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from ..models.schemas import AnalysisRequest, MarketTrend, MarketShareSnapshot
+from ..responses import FastJSONResponse, encode_matrix
 from ..services.analysis_service import AnalysisService
+from ..services.embedding_cache import embedding_cache
+from ..services.job_queue import analysis_job_queue
 from ..database import db
 
 router = APIRouter()
@@ -15,26 +18,24 @@ async def get_analysis_service():
     return AnalysisService(database)
 
 
-@router.post("/market-analysis", response_model=Analysis)
+@router.post("/market-analysis", response_model=None)
 async def analyze_market(
         request: AnalysisRequest = Body(...),
+        matrix_encoding: str = Query("json", description="'json' nested lists or 'base64' packed float32"),
         service: AnalysisService = Depends(get_analysis_service)
 ):
-    try:
-        logging.debug(f"Received analysis request: {request.dict()}")
-
-        # Validate competitor existence
-        for comp_id in request.competitor_ids:
-            try:
-                ObjectId(comp_id)  # Validate ID format
-            except:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Invalid competitor ID format: {comp_id}"
-                )
+    """Market positions, share trends and the similarity matrix of the given competitors
 
+    ``similarity_scores`` is a nested list with ``matrix_encoding=json`` and
+    an object with ``encoding``, ``dtype``, ``shape`` and base64 ``data``
+    with ``matrix_encoding=base64``.
+    """
+    try:
+        # Unknown or malformed competitor ids surface as a ValueError
         result = await service.perform_market_analysis(request)
-        return result
+        # Built from validated inputs; skip re-validating every score
+        result["similarity_scores"] = encode_matrix(result["similarity_scores"], matrix_encoding)
+        return FastJSONResponse(result)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -43,6 +44,54 @@ async def analyze_market(
             status_code=500,
             detail="An error occurred during market analysis"
         )
+@router.post("/market-analysis/jobs", status_code=202)
+async def submit_market_analysis_job(
+        request: AnalysisRequest = Body(...),
+        tenant: str = Header("default", alias="X-Tenant-Id")
+):
+    """Queue a market analysis and return its job id immediately"""
+    job_id = await analysis_job_queue.submit(request, tenant)
+    return {"job_id": job_id, "status": "queued"}
+
+@router.get("/market-analysis/jobs/{job_id}")
+async def get_market_analysis_job(
+        job_id: str,
+        matrix_encoding: str = Query("json", description="'json' nested lists or 'base64' packed float32")
+):
+    job = await analysis_job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        for section in (job["partial"], job["result"]):
+            if section and "similarity_scores" in section:
+                section["similarity_scores"] = encode_matrix(section["similarity_scores"], matrix_encoding)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(job)
+
+@router.get("/market-analysis/jobs/{job_id}/events")
+async def stream_market_analysis_job(job_id: str):
+    """Server-sent events with partial results until the job completes or fails"""
+    if not await analysis_job_queue.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        analysis_job_queue.events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@router.post("/market-share/snapshots")
+async def record_market_share_snapshots(
+    snapshots: List[MarketShareSnapshot] = Body(...),
+    service: AnalysisService = Depends(get_analysis_service)
+):
+    """Store historical daily market-share points, e.g. from a vendor backfill"""
+    try:
+        await service.market_share.record_snapshots(snapshot.dict() for snapshot in snapshots)
+        return {"recorded": len(snapshots)}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/trends", response_model=List[MarketTrend])
 async def get_market_trends(
     service: AnalysisService = Depends(get_analysis_service)
@@ -55,14 +104,36 @@ async def get_market_trends(
 @router.post("/competitor-comparison")
 async def compare_competitors(
     competitor_ids: List[str] = Body(...),
+    mode: str = Query("pooled", description="'pooled' (mean feature vector) or 'set' (mean of best feature matches)"),
+    output: str = Query("pairs", description="'pairs' for {\"id1-id2\": score} or 'matrix' for a compact matrix"),
+    matrix_encoding: str = Query("json", description="With output=matrix: 'json' nested lists or 'base64' packed float32"),
     service: AnalysisService = Depends(get_analysis_service)
 ):
     try:
-        return await service.compare_competitors(competitor_ids)
+        comparison = await service.compare_competitors(competitor_ids, mode=mode, output=output)
+        if output == "matrix":
+            features = comparison["feature_comparison"]
+            features["matrix"] = encode_matrix(features["matrix"], matrix_encoding)
+        return FastJSONResponse(comparison)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/segments")
+async def get_market_segments(
+    segments: Optional[int] = Query(None, ge=1, le=1000, description="Number of segments (k)"),
+    matrix_encoding: str = Query("json", description="Centroids as 'json' nested lists or 'base64' packed float32"),
+    service: AnalysisService = Depends(get_analysis_service)
+):
+    """Competitors clustered by embedding, with centroids and intra-segment uniqueness"""
+    try:
+        segmentation = await service.segment_market(segments)
+        segmentation["centroids"] = encode_matrix(segmentation["centroids"], matrix_encoding)
+        return FastJSONResponse(segmentation)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/sentiment-analysis/{competitor_id}")
 async def analyze_sentiment(
         competitor_id: str,
@@ -70,7 +141,7 @@ async def analyze_sentiment(
 ):
     try:
         # Check if competitor exists
-        competitor = await service.competitor_collection.find_one({"_id": competitor_id})
+        competitor = await service.get_competitor(competitor_id)
         if not competitor:
             raise HTTPException(
                 status_code=404,
@@ -78,6 +149,8 @@ async def analyze_sentiment(
             )
 
         return await service.analyze_sentiment(competitor_id)
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in sentiment analysis: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -89,4 +162,16 @@ async def get_competitor_report(
     try:
         return await service.generate_competitor_report(competitor_id)
     except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/keywords/{competitor_id}")
+async def get_competitor_keywords(
+    competitor_id: str,
+    top_n: int = Query(10, ge=1, le=100),
+    service: AnalysisService = Depends(get_analysis_service)
+):
+    return await service.get_competitor_keywords(competitor_id, top_n)
+
+@router.get("/embedding-cache/stats")
+async def get_embedding_cache_stats():
+    return embedding_cache.stats()
\ No newline at end of file
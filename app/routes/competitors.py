@@ -1,7 +1,11 @@
 # app/routes/competitors.py
-from fastapi import APIRouter, HTTPException, Body, Depends
-from typing import List
-from ..models.schemas import CompetitorCreate, Competitor
+import json
+
+from fastapi import APIRouter, HTTPException, Body, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from ..models.schemas import CompetitorCreate, Competitor, CompetitorProjection
+from ..responses import FastJSONResponse, dumps
 from ..services.competitor_service import CompetitorService
 from ..database import db
 
@@ -21,15 +25,111 @@ async def create_competitor(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/", response_model=List[Competitor])
+async def iter_request_rows(request: Request):
+    """Yield rows from a JSON array body or, line by line, from an NDJSON body"""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_line(line)
+        if buffer.strip():
+            yield _parse_line(buffer)
+        return
+
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(body, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    for row in body:
+        yield row
+
+def _parse_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError:
+        # Reported as a failed row rather than failing the whole ingest
+        return line.decode("utf-8", errors="replace")
+
+@router.post("/bulk")
+async def bulk_create_competitors(
+    request: Request,
+    service: CompetitorService = Depends(get_competitor_service)
+):
+    """Insert many competitors from a JSON array or NDJSON body"""
+    return await service.bulk_write_competitors(iter_request_rows(request))
+
+@router.post("/bulk/upsert")
+async def bulk_upsert_competitors(
+    request: Request,
+    service: CompetitorService = Depends(get_competitor_service)
+):
+    """Upsert many competitors, matched by id when given and by website otherwise"""
+    return await service.bulk_write_competitors(iter_request_rows(request), upsert=True)
+
+@router.get("/", response_model=List[CompetitorProjection], response_model_exclude_unset=True)
 async def get_competitors(
+    limit: Optional[int] = Query(None, ge=1, description="Page size, capped at COMPETITORS_MAX_PAGE_SIZE"),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[List[str]] = Query(None, description="Only return these fields (id is always included)"),
+    min_market_share: Optional[float] = Query(None, ge=0, le=100),
+    max_market_share: Optional[float] = Query(None, ge=0, le=100),
+    name_prefix: Optional[str] = Query(None),
     service: CompetitorService = Depends(get_competitor_service)
 ):
     try:
-        return await service.get_all_competitors()
+        page, next_cursor = await service.get_competitors_page(
+            limit=limit,
+            after=after,
+            fields=fields,
+            min_market_share=min_market_share,
+            max_market_share=max_market_share,
+            name_prefix=name_prefix
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    # Documents were validated on write; serialize them without a model per row
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return FastJSONResponse(page, headers=headers)
+
+@router.get("/export")
+async def export_competitors(
+    fields: Optional[List[str]] = Query(None),
+    min_market_share: Optional[float] = Query(None, ge=0, le=100),
+    max_market_share: Optional[float] = Query(None, ge=0, le=100),
+    name_prefix: Optional[str] = Query(None),
+    service: CompetitorService = Depends(get_competitor_service)
+):
+    """Stream every matching competitor as NDJSON, one document per line"""
+    try:
+        documents = service.stream_competitors(
+            fields=fields,
+            min_market_share=min_market_share,
+            max_market_share=max_market_share,
+            name_prefix=name_prefix
+        )
+        # Surface projection errors before the response starts
+        first = await documents.__anext__()
+    except StopAsyncIteration:
+        return StreamingResponse(iter(()), media_type="application/x-ndjson")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def ndjson_lines():
+        yield dumps(first) + b"\n"
+        async for doc in documents:
+            yield dumps(doc) + b"\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 @router.get("/{competitor_id}", response_model=Competitor)
 async def get_competitor(
     competitor_id: str,
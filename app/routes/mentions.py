@@ -0,0 +1,37 @@
+# app/routes/mentions.py
+from fastapi import APIRouter, HTTPException, Body, Depends, Query
+from typing import List
+from ..models.schemas import MentionCreate
+from ..services.mention_service import MentionService
+from ..database import db
+
+router = APIRouter()
+
+async def get_mention_service():
+    database = db.get_database()
+    return MentionService(database)
+
+@router.post("/")
+async def ingest_mentions(
+    mentions: List[MentionCreate] = Body(...),
+    service: MentionService = Depends(get_mention_service)
+):
+    try:
+        return await service.ingest_mentions(mentions)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{competitor_id}")
+async def get_mentions(
+    competitor_id: str,
+    limit: int = Query(50, ge=1, le=1000),
+    service: MentionService = Depends(get_mention_service)
+):
+    return await service.get_recent_mentions(competitor_id, limit)
+
+@router.get("/{competitor_id}/sentiment")
+async def get_mention_sentiment(
+    competitor_id: str,
+    service: MentionService = Depends(get_mention_service)
+):
+    return await service.get_sentiment_summary(competitor_id)
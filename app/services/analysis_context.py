@@ -0,0 +1,26 @@
+# app/services/analysis_context.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class AnalysisContext:
+    """Request-scoped memo of analysis sub-results
+
+    The first caller for a key starts the computation as a task; later or
+    concurrent callers for the same key await that task instead of
+    recomputing it. One context lives for the duration of one request.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    async def memo(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result for key, computing it with factory at most once"""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+        return await task
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._tasks
@@ -0,0 +1,119 @@
+# app/services/analysis_results.py
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from bson import Binary
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING
+
+from ..config import settings
+
+
+def pack_matrix(matrix) -> Dict:
+    """Little-endian float32 bytes plus shape: 4 bytes per score instead of a BSON double array"""
+    packed = np.ascontiguousarray(matrix, dtype="<f4")
+    return {"shape": list(packed.shape), "data": Binary(packed.tobytes())}
+
+
+def unpack_matrix(stored) -> np.ndarray:
+    if isinstance(stored, dict):
+        return np.frombuffer(stored["data"], dtype="<f4").reshape(stored["shape"])
+    # Results stored before packing hold nested lists
+    return np.asarray(stored)
+
+
+def storable_result(result: Dict) -> Dict:
+    """Copy of an analysis result for MongoDB: the similarity matrix packed, other arrays as lists"""
+    return {
+        key: pack_matrix(value) if key == "similarity_scores"
+        else value.tolist() if isinstance(value, np.ndarray) else value
+        for key, value in result.items()
+    }
+
+
+class AnalysisResultStore:
+    """Stored market-analysis results, addressed by a fingerprint of their inputs
+
+    The fingerprint covers the sorted competitor ids and their ``updated_at``
+    timestamps, the date range, the analysis type and the embedding model, so
+    any identical request (in any id order) maps to the same document.
+    Results are marked stale when one of their competitors or its share
+    history changes, and expire through a TTL index on ``created_at``.
+    """
+
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self.collection = database.analysis
+
+    async def ensure_indexes(self):
+        await self.collection.create_index(
+            "created_at",
+            expireAfterSeconds=settings.ANALYSIS_RESULT_TTL_SECONDS
+        )
+        await self.collection.create_index([("competitor_ids", ASCENDING), ("stale", ASCENDING)])
+
+    @staticmethod
+    def fingerprint(
+            competitors: List[Dict],
+            start_date: datetime,
+            end_date: datetime,
+            analysis_type: str
+    ) -> str:
+        payload = {
+            "competitors": sorted(
+                (str(comp["_id"]), str(comp.get("updated_at"))) for comp in competitors
+            ),
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "analysis_type": analysis_type,
+            "model": settings.EMBEDDING_MODEL,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    async def get(self, fingerprint: str, competitor_ids: List[str]) -> Optional[Dict]:
+        """Return a fresh stored result, with scores reordered to ``competitor_ids``"""
+        try:
+            doc = await self.collection.find_one({"_id": fingerprint, "stale": False})
+        except Exception as e:
+            logging.warning(f"Analysis result lookup failed: {str(e)}")
+            return None
+        if not doc:
+            return None
+
+        result = doc["result"]
+        scores = unpack_matrix(result["similarity_scores"])
+        if doc["competitor_ids"] != competitor_ids:
+            stored_row = {cid: row for row, cid in reversed(list(enumerate(doc["competitor_ids"])))}
+            order = [stored_row[cid] for cid in competitor_ids]
+            scores = scores[np.ix_(order, order)]
+        result["similarity_scores"] = scores
+        return result
+
+    async def save(self, fingerprint: str, competitor_ids: List[str], result: Dict):
+        try:
+            await self.collection.replace_one(
+                {"_id": fingerprint},
+                {
+                    "competitor_ids": competitor_ids,
+                    # The packed matrix keeps results well under the 16 MB
+                    # document limit up to ~2,000 competitors
+                    "result": storable_result(result),
+                    "stale": False,
+                    "created_at": datetime.utcnow(),
+                },
+                upsert=True
+            )
+        except Exception as e:
+            # Oversized or failed writes only cost a recomputation next time
+            logging.warning(f"Could not store analysis result: {str(e)}")
+
+    async def mark_stale(self, competitor_ids: List[str]):
+        """Flag every stored result that involves one of these competitors"""
+        if competitor_ids:
+            await self.collection.update_many(
+                {"competitor_ids": {"$in": [str(cid) for cid in competitor_ids]}, "stale": False},
+                {"$set": {"stale": True}}
+            )
@@ -1,13 +1,37 @@
+import asyncio
 import logging
 from datetime import datetime
-from typing import List, Dict
+from typing import Awaitable, Callable, List, Dict, Optional
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from ..models.schemas import AnalysisRequest, Analysis, MarketTrend
 from ..config import settings
+from .analysis_context import AnalysisContext
+from .analysis_results import AnalysisResultStore
+from .embedding_engine import embedding_engine
+from .embedding_cache import embedding_cache
+from .competitor_matrix import competitor_matrix
+from .keywords import keyword_engine
+from .market_share_service import MarketShareService
+from .mention_service import MentionService
+from .metrics import stage_timer
+from .quantization import QuantizedMatrix
+from .similarity import FEATURE_MODES, feature_similarity, similarity_pairs
+from .vector_index import top_k
+from .utils import build_competitor_text
 from bson import ObjectId
+from bson.errors import InvalidId
+
+# Competitor fields read by the analysis pipeline
+ANALYSIS_FIELDS = {
+    "name": 1,
+    "description": 1,
+    "price_range": 1,
+    "strengths": 1,
+    "features": 1,
+    "market_share": 1,
+    "updated_at": 1,
+}
 
 class AnalysisService:
     def __init__(self, database: AsyncIOMotorDatabase):
@@ -15,48 +39,83 @@ class AnalysisService:
         self.collection = self.db.analysis
         self.trends_collection = self.db.market_trends
         self.competitor_collection = self.db.competitors
-        # Initialize the embedding model
-        self.model = SentenceTransformer(settings.EMBEDDING_MODEL)
-
-    async def perform_market_analysis(self, request: AnalysisRequest) -> Analysis:
-        """Perform comprehensive market analysis"""
+        self.market_share = MarketShareService(self.db)
+        self.results = AnalysisResultStore(self.db)
+        self.mentions = MentionService(self.db)
+        # Shared encoder that batches requests off the event loop
+        self.encoder = embedding_engine
+        # Content-addressed cache for stable texts such as descriptions
+        self.embedding_cache = embedding_cache
+
+    async def perform_market_analysis(
+            self,
+            request: AnalysisRequest,
+            progress: Optional[Callable[[str, Dict], Awaitable[None]]] = None
+    ) -> Analysis:
+        """Perform comprehensive market analysis
+
+        ``progress`` is awaited with each partial result as it becomes
+        available: market positions first, then share trends.
+        """
         try:
             # Get competitor data
-            competitors = await self._get_competitors_data(request.competitor_ids)
+            with stage_timer("fetch"):
+                competitors = await self._get_competitors_data(request.competitor_ids)
 
             if not competitors:
                 raise ValueError("No valid competitors found for analysis")
 
+            # Identical inputs return the stored result without recomputing
+            fingerprint = self.results.fingerprint(
+                competitors, request.start_date, request.end_date, request.analysis_type
+            )
+            with stage_timer("result_lookup"):
+                stored = await self.results.get(fingerprint, request.competitor_ids)
+            if stored:
+                return stored
+
             # Make sure competitors have descriptions
-            descriptions = []
-            for comp in competitors:
-                desc = comp.get('description', '')
-                if not desc:
-                    desc = f"{comp['name']} - {comp.get('price_range', '')} - {', '.join(comp.get('strengths', []))}"
-                descriptions.append(desc)
+            descriptions = [build_competitor_text(comp) for comp in competitors]
 
-            # Generate embeddings
-            embeddings = self.model.encode(descriptions)
+            # Generate embeddings, reusing cached ones for unchanged descriptions
+            with stage_timer("encode"):
+                embeddings = await self.embedding_cache.encode(descriptions)
 
-            # Calculate similarity matrix
-            similarity_matrix = cosine_similarity(embeddings)
+            # Calculate similarity matrix, scored on the quantized embeddings
+            with stage_timer("similarity"):
+                similarity_matrix = QuantizedMatrix.from_vectors(
+                    embeddings, settings.VECTOR_INDEX_STORAGE
+                ).pairwise()
 
             # Analyze market positioning
-            market_positions = self._analyze_market_positions(competitors, similarity_matrix)
+            with stage_timer("positioning"):
+                market_positions = self._analyze_market_positions(competitors, similarity_matrix)
+            if progress:
+                await progress("market_positions", {
+                    "market_positions": market_positions,
+                    "similarity_scores": similarity_matrix
+                })
 
             # Calculate market share trends
-            share_trends = await self._calculate_market_share_trends(
-                request.competitor_ids,
-                request.start_date,
-                request.end_date
-            )
-
-            return {
+            with stage_timer("trends"):
+                share_trends = await self._calculate_market_share_trends(
+                    request.competitor_ids,
+                    request.start_date,
+                    request.end_date
+                )
+            if progress:
+                await progress("share_trends", {"share_trends": share_trends})
+
+            result = {
                 "analysis_date": datetime.utcnow(),
                 "market_positions": market_positions,
                 "share_trends": share_trends,
-                "similarity_scores": similarity_matrix.tolist()
+                # Kept as an array; routes serialize it without a list copy
+                "similarity_scores": similarity_matrix
             }
+            with stage_timer("result_save"):
+                await self.results.save(fingerprint, request.competitor_ids, result)
+            return result
         except Exception as e:
             logging.error(f"Market analysis error: {str(e)}")
             raise ValueError(str(e))
@@ -69,19 +128,39 @@ class AnalysisService:
             trends.append(MarketTrend(**trend))
         return trends
 
-    async def compare_competitors(self, competitor_ids: List[str]) -> Dict:
+    async def compare_competitors(
+            self,
+            competitor_ids: List[str],
+            mode: str = "pooled",
+            output: str = "pairs"
+    ) -> Dict:
         """Compare multiple competitors"""
+        if mode not in FEATURE_MODES:
+            raise ValueError(f"Unknown comparison mode: {mode}. Use one of {', '.join(FEATURE_MODES)}")
+        if output not in ("pairs", "matrix"):
+            raise ValueError(f"Unknown comparison output: {output}. Use 'pairs' or 'matrix'")
+
         competitors = await self._get_competitors_data(competitor_ids)
 
-        # Generate embeddings for features and strengths
-        feature_embeddings = {}
+        # Encode the features and strengths of every competitor in one batch
+        compared_ids = []
+        features = []
+        counts = []
         for comp in competitors:
-            features = comp.get('features', []) + comp.get('strengths', [])
-            if features:
-                feature_embeddings[comp['_id']] = self.model.encode(features)
-
-        # Calculate feature similarity
-        comparison_results = self._calculate_feature_similarity(feature_embeddings)
+            comp_features = comp.get('features', []) + comp.get('strengths', [])
+            if comp_features:
+                compared_ids.append(str(comp['_id']))
+                features.extend(comp_features)
+                counts.append(len(comp_features))
+
+        comparison_results = {} if output == "pairs" else {"competitor_ids": [], "matrix": []}
+        if compared_ids:
+            embeddings = await self.embedding_cache.encode(features)
+            matrix = feature_similarity(embeddings, np.array(counts), mode)
+            if output == "pairs":
+                comparison_results = similarity_pairs(compared_ids, matrix)
+            else:
+                comparison_results = {"competitor_ids": compared_ids, "matrix": matrix}
 
         return {
             "comparison_date": datetime.utcnow(),
@@ -89,61 +168,94 @@ class AnalysisService:
             "competitors": [comp['name'] for comp in competitors]
         }
 
+    async def segment_market(self, segments: Optional[int] = None) -> Dict:
+        """Cluster every competitor into market segments"""
+        await competitor_matrix.ensure_loaded(self.competitor_collection)
+        segmentation = await competitor_matrix.segment(segments or settings.SEGMENTATION_DEFAULT_SEGMENTS)
+        return {"segmentation_date": datetime.utcnow(), **segmentation}
+
     async def analyze_sentiment(self, competitor_id: str) -> Dict:
         """Analyze sentiment for a competitor"""
-        # Get competitor mentions and reviews
-        mentions = await self._get_competitor_mentions(competitor_id)
-
-        if not mentions:
-            return {
-                "sentiment_score": 0,
-                "mention_count": 0,
-                "analysis_date": datetime.utcnow()
-            }
-
-        # Generate embeddings for mentions
-        embeddings = self.model.encode(mentions)
-
-        # Calculate sentiment using a simple heuristic
-        # In a real application, you'd want to use a proper sentiment analysis model
-        sentiment_scores = self._calculate_basic_sentiment(mentions)
-
+        # Mentions are scored on ingest; this reads the running aggregate
+        summary = await self.mentions.get_sentiment_summary(competitor_id)
         return {
-            "sentiment_score": float(np.mean(sentiment_scores)),
-            "mention_count": len(mentions),
+            "sentiment_score": float(summary["sentiment_score"]),
+            "mention_count": summary["mention_count"],
+            "sentiment_histogram": summary["sentiment_histogram"],
             "analysis_date": datetime.utcnow()
         }
 
+    async def get_competitor_keywords(self, competitor_id: str, top_n: int = 10) -> Dict:
+        """TF-IDF keywords and terms that set a competitor apart from the market"""
+        await keyword_engine.ensure_loaded(self.db)
+        statistics = keyword_engine.statistics
+        return {
+            "competitor_id": competitor_id,
+            "documents": statistics.documents[competitor_id],
+            "keywords": statistics.keywords(competitor_id, top_n),
+            "distinguishing_terms": statistics.distinguishing_terms(competitor_id, top_n)
+        }
+
     async def generate_competitor_report(self, competitor_id: str) -> Dict:
         """Generate a comprehensive competitor report"""
-        competitor = await self.competitor_collection.find_one({"_id": competitor_id})
+        context = AnalysisContext()
+        competitor = await context.memo(
+            ("competitor", competitor_id),
+            lambda: self.get_competitor(competitor_id)
+        )
         if not competitor:
             raise ValueError("Competitor not found")
 
-        sentiment = await self.analyze_sentiment(competitor_id)
-        market_position = await self._analyze_single_competitor_position(competitor_id)
+        # Sentiment and position are independent; recommendations reuse both
+        sentiment, market_position = await asyncio.gather(
+            self._memoized_sentiment(context, competitor_id),
+            self._memoized_position(context, competitor_id)
+        )
 
         return {
             "competitor_name": competitor['name'],
             "market_position": market_position,
             "sentiment_analysis": sentiment,
             "report_date": datetime.utcnow(),
-            "recommendations": await self._generate_recommendations(competitor_id)
+            "recommendations": await self._generate_recommendations(competitor, context)
         }
 
+    async def get_competitor(self, competitor_id: str) -> Dict:
+        """Fetch a single competitor's analysis fields, or None if it does not exist"""
+        try:
+            return (await self._get_competitors_data([competitor_id]))[0]
+        except ValueError:
+            return None
+
     async def _get_competitors_data(self, competitor_ids: List[str]) -> List[Dict]:
-        """Fetch competitor data from database"""
-        competitors = []
+        """Fetch competitor data from database in a single round trip, keeping the given order"""
+        malformed = []
+        object_ids = {}
         for cid in competitor_ids:
             try:
-                comp = await self.competitor_collection.find_one({"_id": ObjectId(cid)})
-                if comp:
-                    competitors.append(comp)
-                else:
-                    raise ValueError(f"Competitor with id {cid} not found")
-            except Exception as e:
-                raise ValueError(f"Invalid competitor id format or not found: {cid}")
-        return competitors
+                object_ids[cid] = ObjectId(cid)
+            except (InvalidId, TypeError):
+                malformed.append(cid)
+
+        found = {}
+        if object_ids:
+            cursor = self.competitor_collection.find(
+                {"_id": {"$in": list(set(object_ids.values()))}},
+                ANALYSIS_FIELDS
+            )
+            async for comp in cursor:
+                found[comp["_id"]] = comp
+
+        missing = [cid for cid, oid in object_ids.items() if oid not in found]
+        if malformed or missing:
+            problems = []
+            if malformed:
+                problems.append(f"invalid competitor id format: {', '.join(malformed)}")
+            if missing:
+                problems.append(f"competitors not found: {', '.join(missing)}")
+            raise ValueError("; ".join(problems))
+
+        return [found[object_ids[cid]] for cid in competitor_ids]
 
     def _analyze_market_positions(self, competitors: List[Dict], similarity_matrix: np.ndarray) -> Dict:
         """Analyze market positions based on similarity matrix"""
@@ -153,12 +265,13 @@ class AnalysisService:
             similarities = np.delete(similarity_matrix[i], i)
             avg_similarity = float(np.mean(similarities))
 
+            # Top-2 neighbours in O(n) instead of sorting the whole row
+            others = [j for j in range(len(competitors)) if j != i]
             positions[comp['name']] = {
                 "uniqueness_score": 1 - avg_similarity,
                 "similar_competitors": [
-                    competitors[j]['name']
-                    for j in np.argsort(similarities)[-2:]
-                    if similarities[j] > 0.7
+                    competitors[others[j]]['name']
+                    for j in top_k(similarities, 2, threshold=0.7)[::-1]
                 ]
             }
         return positions
@@ -170,101 +283,64 @@ class AnalysisService:
             end_date: datetime
     ) -> Dict:
         """Calculate market share trends over time"""
-        # In a real application, you'd fetch historical data
-        # For now, we'll return dummy data
-        return {
-            "trend_period": f"{start_date.date()} to {end_date.date()}",
-            "trends": {
-                "growing": 3,
-                "declining": 1,
-                "stable": 2
-            }
-        }
-
-    def _calculate_feature_similarity(self, feature_embeddings: Dict) -> Dict:
-        """Calculate similarity between competitor features"""
-        results = {}
-        companies = list(feature_embeddings.keys())
-
-        for i, comp1 in enumerate(companies):
-            for comp2 in companies[i + 1:]:
-                sim_score = cosine_similarity(
-                    feature_embeddings[comp1].reshape(1, -1),
-                    feature_embeddings[comp2].reshape(1, -1)
-                )[0][0]
-
-                results[f"{comp1}-{comp2}"] = float(sim_score)
-
-        return results
-
-    def _calculate_basic_sentiment(self, texts: List[str]) -> np.ndarray:
-        """Calculate basic sentiment scores"""
-        # This is a very basic sentiment analysis
-        # In a real application, you'd want to use a proper sentiment analysis model
-        positive_words = {'good', 'great', 'excellent', 'amazing', 'best'}
-        negative_words = {'bad', 'poor', 'terrible', 'worst', 'disappointing'}
-
-        scores = []
-        for text in texts:
-            words = set(text.lower().split())
-            positive_count = len(words.intersection(positive_words))
-            negative_count = len(words.intersection(negative_words))
-
-            if positive_count + negative_count == 0:
-                scores.append(0)
-            else:
-                scores.append((positive_count - negative_count) /
-                              (positive_count + negative_count))
+        return await self.market_share.calculate_trends(competitor_ids, start_date, end_date)
 
-        return np.array(scores)
-
-    async def _generate_recommendations(self, competitor_id: str) -> List[str]:
+    async def _generate_recommendations(
+            self,
+            competitor: Dict,
+            context: Optional[AnalysisContext] = None
+    ) -> List[str]:
         """Generate recommendations based on analysis"""
-        competitor = await self.competitor_collection.find_one({"_id": competitor_id})
-        if not competitor:
-            return []
+        competitor_id = str(competitor["_id"])
+        context = context or AnalysisContext()
+        position, sentiment = await asyncio.gather(
+            self._memoized_position(context, competitor_id),
+            self._memoized_sentiment(context, competitor_id)
+        )
 
         recommendations = []
 
         # Add recommendations based on market position
-        position = await self._analyze_single_competitor_position(competitor_id)
         if position.get('uniqueness_score', 0) < 0.3:
             recommendations.append("Consider differentiation strategies to stand out in the market")
 
         # Add recommendations based on sentiment
-        sentiment = await self.analyze_sentiment(competitor_id)
         if sentiment['sentiment_score'] < 0:
             recommendations.append("Focus on improving customer satisfaction and brand perception")
 
         return recommendations
 
+    async def _memoized_position(self, context: AnalysisContext, competitor_id: str) -> Dict:
+        return await context.memo(
+            ("position", competitor_id),
+            lambda: self._analyze_single_competitor_position(competitor_id)
+        )
+
+    async def _memoized_sentiment(self, context: AnalysisContext, competitor_id: str) -> Dict:
+        return await context.memo(
+            ("sentiment", competitor_id),
+            lambda: self.analyze_sentiment(competitor_id)
+        )
+
     async def _analyze_single_competitor_position(self, competitor_id: str) -> Dict:
         """Analyze market position for a single competitor"""
-        competitor = await self.competitor_collection.find_one({"_id": competitor_id})
-        if not competitor:
+        await competitor_matrix.ensure_loaded(self.competitor_collection)
+        if competitor_id not in competitor_matrix:
             return {}
 
-        # Compare with other competitors
-        other_competitors = self.competitor_collection.find({"_id": {"$ne": competitor_id}})
-        all_competitors = [competitor]
-        async for comp in other_competitors:
-            all_competitors.append(comp)
-
-        # Generate embeddings
-        descriptions = [comp.get('description', '') for comp in all_competitors]
-        embeddings = self.model.encode(descriptions)
-
-        # Calculate similarity
-        similarity_matrix = cosine_similarity(embeddings)
+        # Compare with other competitors using the maintained embedding index
+        mean_similarity = competitor_matrix.mean_similarity(competitor_id)
+        if mean_similarity is None:
+            return {
+                "uniqueness_score": 1.0,
+                "market_position": "unique",
+                "closest_competitors": []
+            }
 
         # Analyze position
-        other_similarities = similarity_matrix[0, 1:]
+        closest = competitor_matrix.nearest(competitor_id, k=2, threshold=0.7)
         return {
-            "uniqueness_score": float(1 - np.mean(other_similarities)),
-            "market_position": "unique" if np.mean(other_similarities) < 0.3 else "standard",
-            "closest_competitors": [
-                all_competitors[i + 1]['name']
-                for i in np.argsort(other_similarities)[-2:]
-                if other_similarities[i] > 0.7
-            ]
+            "uniqueness_score": 1 - mean_similarity,
+            "market_position": "unique" if mean_similarity < 0.3 else "standard",
+            "closest_competitors": [name for name, _ in reversed(closest)]
         }
\ No newline at end of file
@@ -0,0 +1,187 @@
+# app/services/coherence.py
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+from ..config import settings
+from .competitor_cache import competitor_cache
+from .competitor_matrix import competitor_matrix
+from .keywords import keyword_engine
+from .utils import build_competitor_text
+
+class CompetitorChangeFeed:
+    """Keeps this worker's in-memory competitor state in step with the collection
+
+    Every competitor write, whichever worker made it, reaches ``apply_upsert``
+    or ``apply_delete``, which update the embedding matrix, keyword
+    statistics and document cache incrementally. Changes arrive through a
+    change stream when the deployment supports one, and otherwise by polling
+    ``updated_at`` plus the ``competitor_tombstones`` collection that
+    ``delete_competitor`` writes. Polling windows overlap to tolerate clock
+    skew between workers; the versions applied inside the overlap are
+    remembered so each change is applied once.
+    """
+
+    def __init__(self, mode: Optional[str] = None, poll_seconds: Optional[float] = None):
+        self.mode = mode or settings.COHERENCE_MODE
+        self.poll_seconds = poll_seconds or settings.COHERENCE_POLL_SECONDS
+        self.overlap = timedelta(seconds=settings.COHERENCE_POLL_OVERLAP_SECONDS)
+        self.database: Optional[AsyncIOMotorDatabase] = None
+        self.source: Optional[str] = None
+        self._watermark: Optional[datetime] = None
+        self._resume_token = None
+        # updated_at / deleted_at already applied per competitor, pruned
+        # once they fall out of the overlap window
+        self._applied: Dict[str, datetime] = {}
+        self._deleted: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._counters = {"upserts": 0, "deletes": 0, "restarts": 0}
+
+    def start(self, database: AsyncIOMotorDatabase):
+        if self.mode == "off" or self._task is not None:
+            return
+        self.database = database
+        # Changes made before this point are already in the startup loads
+        self._watermark = datetime.utcnow() - self.overlap
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        competitor_cache.disable()
+
+    async def _run(self):
+        while True:
+            try:
+                if self.mode in ("auto", "change_stream") and self.source != "poll":
+                    await self._watch()
+                else:
+                    await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Events may have been missed: stop serving cached documents
+                # and catch up from the watermark once reconnected
+                competitor_cache.disable()
+                self._counters["restarts"] += 1
+                logging.error(f"Competitor change feed failed, restarting: {str(e)}")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _watch(self):
+        collection = self.database.competitors
+        opened = False
+        try:
+            stream = collection.watch(
+                full_document="updateLookup",
+                resume_after=self._resume_token
+            )
+            async with stream:
+                opened = True
+                self.source = "change_stream"
+                # Cover the gap between the watermark and opening the stream
+                await self._catch_up()
+                competitor_cache.enable()
+                async for change in stream:
+                    await self._apply_change(change)
+                    self._resume_token = stream.resume_token
+        except OperationFailure as e:
+            if e.code == 286:
+                # Resume point fell off the oplog; fall back to the watermark
+                self._resume_token = None
+            if opened or self.mode != "auto":
+                raise
+            self._fall_back_to_polling(e)
+        except Exception as e:
+            if opened or self.mode != "auto":
+                raise
+            self._fall_back_to_polling(e)
+
+    def _fall_back_to_polling(self, error: Exception):
+        # Standalone servers (and in-memory fakes) have no change streams
+        logging.info(f"Change streams unavailable, polling competitors for changes: {str(error)}")
+        self.source = "poll"
+
+    async def _poll(self):
+        self.source = "poll"
+        await self._catch_up()
+        competitor_cache.enable()
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            await self._catch_up()
+
+    async def _catch_up(self):
+        """Apply every upsert and tombstone newer than the watermark"""
+        since = self._watermark - self.overlap
+        newest = self._watermark
+        cursor = self.database.competitors.find({"updated_at": {"$gte": since}}).sort("updated_at", ASCENDING)
+        async for doc in cursor:
+            if self._applied.get(str(doc["_id"])) != doc["updated_at"]:
+                await self.apply_upsert(doc)
+            newest = max(newest, doc["updated_at"])
+        async for tombstone in self.database.competitor_tombstones.find({"deleted_at": {"$gte": since}}):
+            if self._deleted.get(tombstone["_id"]) != tombstone["deleted_at"]:
+                await self.apply_delete(tombstone["_id"])
+                self._deleted[tombstone["_id"]] = tombstone["deleted_at"]
+            newest = max(newest, tombstone["deleted_at"])
+        self._watermark = newest
+        self._forget_before(newest - self.overlap)
+
+    def _forget_before(self, moment: datetime):
+        # The next window starts at watermark - overlap, so older versions cannot come back
+        self._applied = {key: value for key, value in self._applied.items() if value >= moment}
+        self._deleted = {key: value for key, value in self._deleted.items() if value >= moment}
+
+    async def _apply_change(self, change: Dict):
+        operation = change["operationType"]
+        if operation == "delete":
+            await self.apply_delete(str(change["documentKey"]["_id"]))
+        elif operation in ("insert", "update", "replace") and change.get("fullDocument"):
+            await self.apply_upsert(change["fullDocument"])
+        elif operation in ("drop", "rename", "invalidate"):
+            raise RuntimeError(f"competitors collection {operation}")
+
+    async def apply_upsert(self, doc: Dict):
+        competitor_id = str(doc["_id"])
+        # The cache first: the matrix update may wait on encoding or a fit
+        competitor_cache.refresh(doc)
+        try:
+            await competitor_matrix.upsert_competitor(doc)
+            keyword_engine.sync_description(competitor_id, build_competitor_text(doc))
+        except Exception as e:
+            # Replaying the document would fail the same way and stall the feed
+            logging.error(f"Indexing competitor {competitor_id} from the change feed failed: {str(e)}")
+        if doc.get("updated_at"):
+            self._applied[competitor_id] = doc["updated_at"]
+            self._watermark = max(self._watermark, doc["updated_at"])
+        self._counters["upserts"] += 1
+
+    async def apply_delete(self, competitor_id: str):
+        competitor_cache.discard(competitor_id)
+        await competitor_matrix.remove_competitor(competitor_id)
+        keyword_engine.remove_competitor(competitor_id)
+        self._applied.pop(competitor_id, None)
+        self._counters["deletes"] += 1
+
+    def stats(self) -> Dict:
+        return {
+            "mode": self.mode,
+            "source": self.source,
+            "watermark": self._watermark,
+            **self._counters,
+            "document_cache": competitor_cache.stats(),
+        }
+
+
+# Create a feed instance for this worker
+competitor_changes = CompetitorChangeFeed()
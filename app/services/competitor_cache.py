@@ -0,0 +1,78 @@
+# app/services/competitor_cache.py
+import copy
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from ..config import settings
+
+
+class CompetitorDocumentCache:
+    """LRU of competitor documents, served only while changes are being followed
+
+    Reads hit the cache only while ``enabled`` is set, which the change feed
+    does once it is tracking the collection. Whenever the feed loses track
+    (an error or a restart) it disables and clears the cache, so a missed
+    update can never be served. A read that raced with a change is not
+    cached: callers pass the ``generation`` seen before reading.
+    """
+
+    def __init__(self, max_items: Optional[int] = None):
+        self.max_items = settings.COMPETITOR_CACHE_SIZE if max_items is None else max_items
+        self.enabled = False
+        self.generation = 0
+        self._docs: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def get(self, competitor_id: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        doc = self._docs.get(competitor_id)
+        if doc is None:
+            return None
+        self._docs.move_to_end(competitor_id)
+        return copy.deepcopy(doc)
+
+    def put(self, doc: Dict, generation: Optional[int] = None):
+        if not self.enabled or self.max_items <= 0:
+            return
+        if generation is not None and generation != self.generation:
+            return
+        competitor_id = str(doc["_id"])
+        self._docs[competitor_id] = copy.deepcopy(doc)
+        self._docs.move_to_end(competitor_id)
+        while len(self._docs) > self.max_items:
+            self._docs.popitem(last=False)
+
+    def refresh(self, doc: Dict):
+        """Replace an entry after a change, without caching unseen documents"""
+        self.generation += 1
+        if str(doc["_id"]) in self._docs:
+            self.put(doc)
+
+    def discard(self, competitor_id: str):
+        self.generation += 1
+        self._docs.pop(competitor_id, None)
+
+    def discard_many(self, competitor_ids: List[str], websites: List[str] = ()):
+        """Drop written documents matched by id, or by website for upserts keyed on it"""
+        self.generation += 1
+        competitor_ids, websites = set(competitor_ids), set(websites)
+        for competitor_id in [
+            cached_id for cached_id, doc in self._docs.items()
+            if cached_id in competitor_ids or doc.get("website") in websites
+        ]:
+            del self._docs[competitor_id]
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        self.generation += 1
+        self._docs.clear()
+
+    def stats(self) -> Dict:
+        return {"enabled": self.enabled, "items": len(self._docs), "capacity": self.max_items}
+
+
+# Create a cache instance shared by all services
+competitor_cache = CompetitorDocumentCache()
@@ -0,0 +1,193 @@
+# app/services/competitor_matrix.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+from .embedding_cache import embedding_cache
+from .segmentation import MarketSegmentation
+from .utils import build_competitor_text
+from .vector_index import VectorIndex, create_index, normalize_rows
+
+# Fields needed to build a competitor's embedding text
+MATRIX_FIELDS = {"name": 1, "description": 1, "price_range": 1, "strengths": 1}
+
+
+class CompetitorEmbeddingMatrix:
+    """L2-normalized embeddings of every competitor, kept in sync with writes
+
+    Vectors live in a ``VectorIndex`` (exact or approximate, per
+    ``settings.VECTOR_INDEX_BACKEND``) keyed by competitor id, so create,
+    update and delete are O(dimension) and nearest-competitor queries go
+    through the index instead of sorting a full similarity row. Market
+    segmentations fitted for recent segment counts are kept here too and
+    updated on every write that changes a vector; their described segments
+    are cached until the next such write.
+    """
+
+    def __init__(self, load_batch_size: int = 512, index: Optional[VectorIndex] = None):
+        self.load_batch_size = load_batch_size
+        self.index = index or create_index()
+        self.names: Dict[str, str] = {}
+        self.segmentations: "OrderedDict[int, MarketSegmentation]" = OrderedDict()
+        # Bumped by every write that changes a row; keys the described segments
+        self._version = 0
+        self._described: Dict[int, Tuple[int, Dict]] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self.index)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def ids(self) -> List[str]:
+        return self.index.ids
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """View of the populated rows, parallel to ``ids``"""
+        return self.index.vectors
+
+    def __contains__(self, competitor_id: str) -> bool:
+        return competitor_id in self.index
+
+    async def ensure_loaded(self, collection):
+        """Build the matrix from the competitors collection once"""
+        if self._loaded:
+            return
+        async with self._lock:
+            if self._loaded:
+                return
+            started = time.perf_counter()
+            batch: List[Dict] = []
+            async for doc in collection.find({}, MATRIX_FIELDS):
+                batch.append(doc)
+                if len(batch) >= self.load_batch_size:
+                    await self._add_docs(batch)
+                    batch = []
+            if batch:
+                await self._add_docs(batch)
+            self._loaded = True
+            logging.info(
+                f"Loaded {self.size} competitor embeddings in {time.perf_counter() - started:.2f}s"
+            )
+
+    async def upsert_competitor(self, doc: Dict):
+        """Insert or refresh the row of a created or updated competitor"""
+        await self.upsert_competitors([doc])
+
+    async def upsert_competitors(self, docs: List[Dict]):
+        """Insert or refresh many rows with one batched encode"""
+        if not docs:
+            return
+        if not self._loaded and not self._lock.locked():
+            # Nothing to keep in sync yet, the initial load will read the docs;
+            # still warm the embedding cache so that load does not re-encode
+            await embedding_cache.encode([build_competitor_text(doc) for doc in docs])
+            return
+        async with self._lock:
+            await self._add_docs(docs)
+
+    async def remove_competitor(self, competitor_id: str):
+        """Drop a deleted competitor's row"""
+        if not self._loaded and not self._lock.locked():
+            return
+        async with self._lock:
+            if competitor_id in self.index:
+                self._version += 1
+            self.index.remove([competitor_id])
+            self.names.pop(competitor_id, None)
+            for segmentation in self.segmentations.values():
+                segmentation.remove(competitor_id)
+
+    def vector(self, competitor_id: str) -> Optional[np.ndarray]:
+        return self.index.vector(competitor_id)
+
+    def mean_similarity(self, competitor_id: str) -> Optional[float]:
+        """Average cosine similarity to every other competitor, in O(dimension)"""
+        if self.size < 2:
+            return None
+        vector = self.index.vector(competitor_id)
+        others = self.index.vector_sum - vector
+        return float(vector @ others) / (self.size - 1)
+
+    def nearest(
+            self,
+            competitor_id: str,
+            k: int,
+            threshold: Optional[float] = None
+    ) -> List[Tuple[str, float]]:
+        """Closest other competitors as (name, similarity), best first"""
+        matches = self.index.search(
+            self.index.vector(competitor_id), k, threshold, exclude=competitor_id
+        )
+        return [(self.names.get(other_id, ""), score) for other_id, score in matches]
+
+    async def segment(self, k: int) -> Dict:
+        """Segments of all competitors, refitting only when the cached fit is stale
+
+        Fitting and describing run in the default executor; the lock keeps
+        writes from changing the segmentation meanwhile.
+        """
+        async with self._lock:
+            k = min(k, self.size)
+            if k < 1:
+                return {"k": 0, "competitors": 0, "refitted": False, "centroids": [], "segments": []}
+            segmentation = self.segmentations.get(k)
+            if segmentation is None:
+                segmentation = self.segmentations[k] = MarketSegmentation(k)
+                while len(self.segmentations) > settings.SEGMENTATION_CACHED_MODELS:
+                    evicted, _ = self.segmentations.popitem(last=False)
+                    self._described.pop(evicted, None)
+            self.segmentations.move_to_end(k)
+
+            cached = self._described.get(k)
+            if cached is not None and cached[0] == self._version:
+                return {**cached[1], "refitted": False}
+
+            refitted = segmentation.stale or len(segmentation.labels) != self.size
+            ids, vectors, names = list(self.ids), self.vectors.copy(), dict(self.names)
+
+            def build() -> Dict:
+                if refitted:
+                    segmentation.fit(ids, vectors)
+                return segmentation.describe(ids, vectors, names)
+
+            described = await asyncio.get_running_loop().run_in_executor(None, build)
+            self._described[k] = (self._version, described)
+            return {**described, "refitted": refitted}
+
+    async def _add_docs(self, docs: List[Dict]):
+        embeddings = await embedding_cache.encode([build_competitor_text(doc) for doc in docs])
+        ids = [str(doc["_id"]) for doc in docs]
+        vectors = normalize_rows(embeddings)
+        # Replayed or no-op writes leave the segmentations untouched
+        stored = self.index.as_stored(vectors)
+        changed = []
+        for row, competitor_id in enumerate(ids):
+            previous = self.index.vector(competitor_id)
+            if previous is None or not np.array_equal(previous, stored[row]):
+                changed.append(row)
+        self.index.add(ids, embeddings)
+        for competitor_id, doc in zip(ids, docs):
+            name = doc.get("name", "")
+            if self.names.get(competitor_id) != name:
+                self.names[competitor_id] = name
+                self._version += 1
+        if changed:
+            self._version += 1
+            for segmentation in self.segmentations.values():
+                segmentation.add([ids[row] for row in changed], vectors[changed])
+
+
+# Create a matrix instance shared by all services
+competitor_matrix = CompetitorEmbeddingMatrix()
@@ -1,14 +1,67 @@
 # app/services/competitor_service.py
+import asyncio
+import logging
+import re
 from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from bson import ObjectId
+from bson.errors import InvalidId
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import ValidationError
+from pymongo import ASCENDING, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 
-from ..models.schemas import CompetitorCreate, Competitor
+from ..config import settings
+from ..models.schemas import CompetitorCreate, Competitor, CompetitorProjection
+from .embedding_cache import embedding_cache
+from .competitor_cache import competitor_cache
+from .competitor_matrix import MATRIX_FIELDS, competitor_matrix
+from .keywords import keyword_engine
+from .market_share_service import MarketShareService
+from .analysis_results import AnalysisResultStore
+from .utils import build_competitor_text
+
+# Fields that feed the competitor's embedding text
+TEXT_FIELDS = ("name", "description", "price_range", "strengths")
+# Fields a listing may be projected to
+LISTABLE_FIELDS = set(CompetitorProjection.__fields__) - {"id"}
+
+# Strong references to pending index updates until they finish
+_background_tasks = set()
+
+
+def _run_in_background(coroutine, description: str):
+    """Run follow-up work after a committed write without delaying or failing the response"""
+    async def run():
+        try:
+            await coroutine
+        except Exception as e:
+            logging.error(f"Background {description} failed: {str(e)}")
+
+    task = asyncio.create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def index_competitors(docs: List[Dict]):
+    """Bring the embedding matrix and keyword statistics up to date with docs"""
+    await competitor_matrix.upsert_competitors(docs)
+    for doc in docs:
+        keyword_engine.sync_description(str(doc["_id"]), build_competitor_text(doc))
+
+
+async def unindex_competitor(competitor_id: str):
+    await competitor_matrix.remove_competitor(competitor_id)
+    keyword_engine.remove_competitor(competitor_id)
 
 class CompetitorService:
     def __init__(self, database: AsyncIOMotorDatabase):
         self.db = database
         self.collection = self.db.competitors
+        # Deleted ids, for workers that poll for changes instead of watching
+        self.tombstones = self.db.competitor_tombstones
+        self.market_share = MarketShareService(self.db)
+        self.analysis_results = AnalysisResultStore(self.db)
 
     async def create_competitor(self, competitor: CompetitorCreate) -> Competitor:
         competitor_dict = competitor.dict()
@@ -17,20 +70,225 @@ class CompetitorService:
             "updated_at": datetime.utcnow()
         })
 
-        result = await self.collection.insert_one(competitor_dict)
-        competitor_dict["id"] = str(result.inserted_id)
+        await self.collection.insert_one(competitor_dict)
+        # Encoding may load the model; CRUD never waits for it
+        _run_in_background(index_competitors([dict(competitor_dict)]), "competitor indexing")
+        await self.market_share.record_snapshot(
+            str(competitor_dict["_id"]), competitor_dict["market_share"]
+        )
+        competitor_dict["id"] = str(competitor_dict.pop("_id"))
         return Competitor(**competitor_dict)
 
-    async def get_all_competitors(self) -> list[Competitor]:
-        competitors = []
-        cursor = self.collection.find({})
+    async def bulk_write_competitors(self, rows: AsyncIterator[Any], upsert: bool = False) -> Dict:
+        """Validate and write rows in chunks with unordered bulk_write
+
+        Without ``upsert`` every valid row is inserted. With ``upsert`` a row
+        carrying an ``id`` updates that competitor, any other row is matched
+        on ``website``; unmatched rows are inserted. Returns counts plus one
+        result entry per input row.
+        """
+        summary = {"received": 0, "created": 0, "updated": 0, "failed": 0, "results": []}
+        chunk = []
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= settings.BULK_INGEST_CHUNK_SIZE:
+                await self._write_chunk(chunk, summary["received"], upsert, summary)
+                summary["received"] += len(chunk)
+                chunk = []
+        if chunk:
+            await self._write_chunk(chunk, summary["received"], upsert, summary)
+            summary["received"] += len(chunk)
+        return summary
+
+    async def _write_chunk(self, rows: List[Any], first_row: int, upsert: bool, summary: Dict):
+        now = datetime.utcnow()
+        results = [None] * len(rows)
+        operations = []
+        operation_rows = []
+        written = []
+
+        for i, row in enumerate(rows):
+            try:
+                if not isinstance(row, dict):
+                    raise ValueError("row is not a JSON object")
+                row_id = row.get("id")
+                doc = CompetitorCreate(**row).dict()
+                doc["updated_at"] = now
+                if upsert:
+                    if row_id:
+                        key = {"_id": ObjectId(row_id)}
+                        results[i] = {"row": first_row + i, "status": "updated", "id": str(key["_id"])}
+                    else:
+                        key = {"website": doc["website"]}
+                        results[i] = {"row": first_row + i, "status": "updated", "website": doc["website"]}
+                    operations.append(UpdateOne(
+                        key,
+                        {"$set": doc, "$setOnInsert": {"created_at": now}},
+                        upsert=True
+                    ))
+                else:
+                    doc["_id"] = ObjectId()
+                    doc["created_at"] = now
+                    key = {"_id": doc["_id"]}
+                    operations.append(InsertOne(doc))
+                    results[i] = {"row": first_row + i, "status": "created", "id": str(doc["_id"])}
+                operation_rows.append(i)
+                written.append(key)
+            except ValidationError as e:
+                errors = "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                    for error in e.errors()
+                )
+                results[i] = {"row": first_row + i, "status": "failed", "error": errors}
+            except (ValueError, InvalidId, TypeError) as e:
+                results[i] = {"row": first_row + i, "status": "failed", "error": str(e)}
+
+        failed_operations = set()
+        bulk_result = None
+        if operations:
+            try:
+                bulk_result = await self.collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                bulk_result = e.details
+                for error in e.details.get("writeErrors", []):
+                    failed_operations.add(error["index"])
+                    i = operation_rows[error["index"]]
+                    results[i] = {"row": first_row + i, "status": "failed", "error": error.get("errmsg", "write failed")}
+            # Drop the written documents before anything else can read them
+            competitor_cache.discard_many(
+                [str(key["_id"]) for key in written if "_id" in key],
+                [key["website"] for key in written if "website" in key]
+            )
+
+        # Upserts that inserted a new document report its generated id
+        if upsert and bulk_result is not None:
+            upserted = (
+                bulk_result.upserted_ids if hasattr(bulk_result, "upserted_ids")
+                else {item["index"]: item["_id"] for item in bulk_result.get("upserted", [])}
+            )
+            for op_index, new_id in upserted.items():
+                i = operation_rows[op_index]
+                results[i]["status"] = "created"
+                results[i]["id"] = str(new_id)
+
+        for result in results:
+            summary[result["status"]] += 1
+        summary["results"].extend(results)
+
+        # Fill the embedding cache and index, and record today's market share,
+        # for the whole chunk at once. The rows are already written, so these
+        # are best-effort and never change the summary.
+        keys = [key for op_index, key in enumerate(written) if op_index not in failed_operations]
+        if keys:
+            try:
+                ids = [key["_id"] for key in keys if "_id" in key]
+                websites = [key["website"] for key in keys if "website" in key]
+                query = {"$or": [{"_id": {"$in": ids}}, {"website": {"$in": websites}}]}
+                docs = await self.collection.find(
+                    query, {**MATRIX_FIELDS, "market_share": 1}
+                ).to_list(length=None)
+                await self.market_share.record_snapshots(
+                    {"competitor_id": doc["_id"], "market_share": doc["market_share"]}
+                    for doc in docs
+                )
+            except Exception as e:
+                logging.error(f"Bulk ingest follow-up for rows {first_row}-{first_row + len(rows) - 1} failed: {str(e)}")
+                return
+            _run_in_background(index_competitors(docs), "bulk competitor indexing")
+
+    async def ensure_indexes(self):
+        """Create the indexes backing filtered, keyset-paginated listings"""
+        await self.collection.create_index([("market_share", ASCENDING), ("_id", ASCENDING)])
+        await self.collection.create_index([("name", ASCENDING), ("_id", ASCENDING)])
+        # Natural key for bulk upserts of vendor data
+        await self.collection.create_index("website")
+        # Change polling (see services/coherence.py)
+        await self.collection.create_index("updated_at")
+        await self.tombstones.create_index(
+            "deleted_at", expireAfterSeconds=settings.COHERENCE_TOMBSTONE_TTL_SECONDS
+        )
+
+    async def get_competitors_page(
+            self,
+            limit: Optional[int] = None,
+            after: Optional[str] = None,
+            fields: Optional[List[str]] = None,
+            min_market_share: Optional[float] = None,
+            max_market_share: Optional[float] = None,
+            name_prefix: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """One page of competitors ordered by _id, plus the cursor of the next page"""
+        limit = min(limit or settings.COMPETITORS_PAGE_SIZE, settings.COMPETITORS_MAX_PAGE_SIZE)
+        query = self._listing_query(min_market_share, max_market_share, name_prefix)
+        if after:
+            query["_id"] = {"$gt": self._parse_cursor(after)}
+
+        # Read one extra document to know whether another page exists
+        cursor = self.collection.find(query, self._listing_projection(fields))
+        cursor = cursor.sort("_id", ASCENDING).limit(limit + 1)
+        docs = await cursor.to_list(length=limit + 1)
+
+        next_cursor = str(docs[limit - 1]["_id"]) if len(docs) > limit else None
+        page = []
+        for doc in docs[:limit]:
+            doc["id"] = str(doc.pop("_id"))
+            page.append(doc)
+        return page, next_cursor
+
+    async def stream_competitors(
+            self,
+            fields: Optional[List[str]] = None,
+            min_market_share: Optional[float] = None,
+            max_market_share: Optional[float] = None,
+            name_prefix: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """Yield matching competitors as the cursor returns them"""
+        query = self._listing_query(min_market_share, max_market_share, name_prefix)
+        cursor = self.collection.find(query, self._listing_projection(fields)).sort("_id", ASCENDING)
         async for doc in cursor:
             doc["id"] = str(doc.pop("_id"))
-            competitors.append(Competitor(**doc))
-        return competitors
+            yield doc
+
+    def _listing_query(
+            self,
+            min_market_share: Optional[float],
+            max_market_share: Optional[float],
+            name_prefix: Optional[str]
+    ) -> Dict:
+        query = {}
+        share_range = {}
+        if min_market_share is not None:
+            share_range["$gte"] = min_market_share
+        if max_market_share is not None:
+            share_range["$lte"] = max_market_share
+        if share_range:
+            query["market_share"] = share_range
+        if name_prefix:
+            # An anchored, case-sensitive prefix regex can use the name index
+            query["name"] = {"$regex": f"^{re.escape(name_prefix)}"}
+        return query
+
+    def _listing_projection(self, fields: Optional[List[str]]) -> Optional[Dict]:
+        if not fields:
+            return None
+        unknown = set(fields) - LISTABLE_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown competitor fields: {', '.join(sorted(unknown))}")
+        return {field: 1 for field in fields}
+
+    def _parse_cursor(self, cursor: str) -> ObjectId:
+        try:
+            return ObjectId(cursor)
+        except (InvalidId, TypeError):
+            raise ValueError(f"Invalid pagination cursor: {cursor}")
 
     async def get_competitor(self, competitor_id: str) -> Competitor:
-        doc = await self.collection.find_one({"_id": ObjectId(competitor_id)})
+        doc = competitor_cache.get(competitor_id)
+        if doc is None:
+            generation = competitor_cache.generation
+            doc = await self.collection.find_one({"_id": ObjectId(competitor_id)})
+            if doc:
+                competitor_cache.put(doc, generation)
         if doc:
             doc["id"] = str(doc.pop("_id"))
             return Competitor(**doc)
@@ -40,15 +298,44 @@ class CompetitorService:
         competitor_dict = competitor.dict()
         competitor_dict["updated_at"] = datetime.utcnow()
 
-        result = await self.collection.update_one(
+        previous = await self.collection.find_one_and_update(
             {"_id": ObjectId(competitor_id)},
-            {"$set": competitor_dict}
+            {"$set": competitor_dict},
+            return_document=ReturnDocument.BEFORE
         )
+        if not previous:
+            return None
 
-        if result.modified_count:
-            return await self.get_competitor(competitor_id)
-        return None
+        # Drop the cached embedding of the old text if the text changed
+        updated = {**previous, **competitor_dict}
+        old_text = build_competitor_text(previous)
+        if old_text != build_competitor_text(updated):
+            await embedding_cache.invalidate_texts([old_text])
+            _run_in_background(index_competitors([dict(updated)]), "competitor indexing")
+        elif previous.get("name") != updated.get("name"):
+            _run_in_background(competitor_matrix.upsert_competitor(dict(updated)), "competitor indexing")
+        if previous.get("market_share") != updated["market_share"]:
+            await self.market_share.record_snapshot(competitor_id, updated["market_share"])
+        await self.analysis_results.mark_stale([competitor_id])
+        competitor_cache.refresh(updated)
+
+        updated["id"] = str(updated.pop("_id"))
+        return Competitor(**updated)
 
     async def delete_competitor(self, competitor_id: str) -> bool:
-        result = await self.collection.delete_one({"_id": ObjectId(competitor_id)})
-        return result.deleted_count > 0
\ No newline at end of file
+        deleted = await self.collection.find_one_and_delete(
+            {"_id": ObjectId(competitor_id)},
+            projection={field: 1 for field in TEXT_FIELDS}
+        )
+        if not deleted:
+            return False
+        competitor_cache.discard(competitor_id)
+        await self.tombstones.replace_one(
+            {"_id": competitor_id},
+            {"deleted_at": datetime.utcnow()},
+            upsert=True
+        )
+        await embedding_cache.invalidate_texts([build_competitor_text(deleted)])
+        _run_in_background(unindex_competitor(competitor_id), "competitor unindexing")
+        await self.analysis_results.mark_stale([competitor_id])
+        return True
\ No newline at end of file
@@ -0,0 +1,170 @@
+# app/services/embedding_cache.py
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from bson import Binary
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from ..config import settings
+from .embedding_engine import embedding_engine
+from .quantization import SCHEMES, pack, unpack
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so cosmetic edits do not change the cache key"""
+    return " ".join((text or "").split())
+
+
+def embedding_key(text: str, model_name: Optional[str] = None) -> str:
+    """Content address of an embedding: hash of (model name, normalized text)"""
+    payload = f"{model_name or settings.EMBEDDING_MODEL}\0{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: in-memory LRU in front of a MongoDB collection"""
+
+    def __init__(self, max_items: Optional[int] = None, model_name: Optional[str] = None,
+                 storage: Optional[str] = None):
+        self.max_items = max_items or settings.EMBEDDING_CACHE_SIZE
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        self.storage = storage or settings.EMBEDDING_STORAGE
+        if self.storage not in SCHEMES:
+            raise ValueError(f"Unknown embedding storage: {self.storage}. Use one of {', '.join(SCHEMES)}")
+        self.collection = None
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._counters = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+        }
+
+    def bind(self, database: AsyncIOMotorDatabase):
+        """Attach the persistent tier; without it only the LRU tier is used"""
+        self.collection = database.embedding_cache
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts, only sending cache misses to the embedding engine"""
+        if not texts:
+            return await embedding_engine.encode([])
+
+        keys = [embedding_key(text, self.model_name) for text in texts]
+        found = await self.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            encoded = await embedding_engine.encode(list(missing.values()))
+            fresh = dict(zip(missing.keys(), encoded))
+            await self.put_many(fresh)
+            found.update(fresh)
+
+        return np.stack([found[key] for key in keys])
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Look keys up in memory first, then in the persistent tier"""
+        found = {}
+        to_fetch = []
+        for key in dict.fromkeys(keys):
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                found[key] = vector
+                self._counters["memory_hits"] += 1
+            else:
+                to_fetch.append(key)
+
+        if to_fetch and self.collection is not None:
+            try:
+                cursor = self.collection.find(
+                    {"_id": {"$in": to_fetch}},
+                    {"embedding": 1, "encoding": 1}
+                )
+                async for doc in cursor:
+                    vector = self._decode(doc)
+                    found[doc["_id"]] = vector
+                    self._remember(doc["_id"], vector)
+                    self._counters["persistent_hits"] += 1
+            except Exception as e:
+                logging.warning(f"Embedding cache lookup failed: {str(e)}")
+
+        self._counters["misses"] += sum(1 for key in to_fetch if key not in found)
+        return found
+
+    async def put_many(self, vectors: Dict[str, np.ndarray]):
+        """Store freshly computed embeddings in both tiers"""
+        for key, vector in vectors.items():
+            self._remember(key, vector)
+
+        if vectors and self.collection is not None:
+            now = datetime.utcnow()
+            try:
+                await self.collection.insert_many(
+                    [
+                        {
+                            "_id": key,
+                            "model": self.model_name,
+                            "embedding": Binary(pack(vector, self.storage)),
+                            "encoding": self.storage,
+                            "created_at": now,
+                        }
+                        for key, vector in vectors.items()
+                    ],
+                    ordered=False
+                )
+            except Exception as e:
+                # Duplicate keys from a concurrent writer are expected and harmless
+                logging.debug(f"Embedding cache write skipped some entries: {str(e)}")
+
+    async def invalidate_texts(self, texts: Iterable[str]):
+        """Drop the entries for texts that no longer describe any competitor"""
+        keys = list({embedding_key(text, self.model_name) for text in texts if text})
+        if not keys:
+            return
+        for key in keys:
+            self._memory.pop(key, None)
+        self._counters["invalidations"] += len(keys)
+
+        if self.collection is not None:
+            try:
+                await self.collection.delete_many({"_id": {"$in": keys}})
+            except Exception as e:
+                logging.warning(f"Embedding cache invalidation failed: {str(e)}")
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current LRU occupancy"""
+        lookups = sum(self._counters[name] for name in ("memory_hits", "persistent_hits", "misses"))
+        hits = self._counters["memory_hits"] + self._counters["persistent_hits"]
+        return {
+            **self._counters,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_items": len(self._memory),
+            "memory_capacity": self.max_items,
+            "persistent": self.collection is not None,
+            "storage": self.storage,
+        }
+
+    @staticmethod
+    def _decode(doc: Dict) -> np.ndarray:
+        # Entries written before binary encoding hold a plain float list
+        if "encoding" not in doc:
+            return np.asarray(doc["embedding"], dtype=np.float32)
+        return unpack(bytes(doc["embedding"]), doc["encoding"])
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+
+# Create a cache instance for the default model
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,148 @@
+# app/services/embedding_engine.py
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+from .metrics import embedding_batch_seconds, texts_encoded
+from .model_registry import model_registry
+
+
+class EmbeddingEngine:
+    """Runs encodes off the event loop, micro-batching concurrent callers
+
+    Texts submitted by concurrent requests within ``max_wait_ms`` of each
+    other are merged into a single ``model.encode`` call (up to
+    ``max_batch_size`` texts) on a worker thread, and the resulting rows are
+    split back to each caller. Torch releases the GIL while encoding, so a
+    thread pool is enough to keep the event loop responsive.
+    """
+
+    def __init__(
+            self,
+            model_name: Optional[str] = None,
+            max_batch_size: Optional[int] = None,
+            max_wait_ms: Optional[float] = None,
+            workers: Optional[int] = None
+    ):
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_MAX_BATCH_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.EMBEDDING_MAX_WAIT_MS) / 1000
+        self.workers = workers or settings.EMBEDDING_WORKERS
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight: set = set()
+
+    @property
+    def model(self):
+        return model_registry.get(self.model_name)
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def start(self):
+        """Start the batching loop on the running event loop"""
+        if self._batcher is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="embedding"
+        )
+        self._batcher = asyncio.create_task(self._batch_loop())
+
+    async def stop(self):
+        """Stop batching and wait for in-flight encodes to finish"""
+        if self._batcher is None:
+            return
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        self._batcher = None
+        self._executor = None
+        self._queue = None
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts, sharing a batch with any concurrent callers"""
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        if self._batcher is None:
+            self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((list(texts), future))
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+
+            while size < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            # Bound the number of batches encoding at once to the pool size,
+            # so waiting requests keep merging instead of queueing in the pool
+            await self._slots.acquire()
+            task = asyncio.create_task(self._run_batch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _run_batch(self, batch: List[Tuple[List[str], asyncio.Future]]):
+        try:
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            started = time.perf_counter()
+            try:
+                embeddings = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, self._encode_sync, texts
+                )
+            except Exception as e:
+                logging.error(f"Embedding batch of {len(texts)} texts failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            texts_encoded.inc(len(texts), model=self.model_name)
+            embedding_batch_seconds.observe(time.perf_counter() - started, model=self.model_name)
+            offset = 0
+            for item_texts, future in batch:
+                count = len(item_texts)
+                if not future.done():
+                    future.set_result(embeddings[offset:offset + count])
+                offset += count
+        finally:
+            self._slots.release()
+
+    def _encode_sync(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(
+            self.model.encode(texts, batch_size=self.max_batch_size, convert_to_numpy=True),
+            dtype=np.float32
+        )
+
+
+# Create an engine instance for the default model
+embedding_engine = EmbeddingEngine()
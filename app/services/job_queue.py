@@ -0,0 +1,287 @@
+# app/services/job_queue.py
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument
+
+from ..config import settings
+from ..models.schemas import AnalysisRequest
+from .analysis_results import storable_result, unpack_matrix
+from .analysis_service import AnalysisService
+
+TERMINAL_STATES = ("completed", "failed")
+# Job fields sent with every server-sent event; results are read with ``get``
+EVENT_FIELDS = {"status": 1, "stage": 1, "error": 1, "updated_at": 1}
+
+
+class InProcessJobBackend:
+    """Fair in-memory scheduler: round-robin across tenants, each capped at a limit
+
+    Jobs wait in one FIFO per tenant; ``get`` hands out the oldest job of the
+    next tenant (in rotation) that is below its concurrency limit, and
+    ``done`` frees that tenant's slot.
+    """
+
+    def __init__(self, tenant_limit: int):
+        self.tenant_limit = tenant_limit
+        self._pending: "OrderedDict[str, deque]" = OrderedDict()
+        self._running: Dict[str, int] = defaultdict(int)
+        self._changed = asyncio.Condition()
+
+    async def put(self, job_id: str, tenant: str):
+        async with self._changed:
+            self._pending.setdefault(tenant, deque()).append(job_id)
+            self._changed.notify_all()
+
+    async def get(self) -> Tuple[str, str]:
+        async with self._changed:
+            while True:
+                for tenant in list(self._pending):
+                    if self._running[tenant] < self.tenant_limit:
+                        queue = self._pending.pop(tenant)
+                        job_id = queue.popleft()
+                        if queue:
+                            # Re-append so the next call starts with another tenant
+                            self._pending[tenant] = queue
+                        self._running[tenant] += 1
+                        return job_id, tenant
+                await self._changed.wait()
+
+    async def done(self, tenant: str):
+        async with self._changed:
+            self._running[tenant] -= 1
+            self._changed.notify_all()
+
+
+class AnalysisJobQueue:
+    """Runs /market-analysis requests as background jobs persisted in MongoDB
+
+    Job state, partial results (positions first, then trends) and the final
+    result live in the ``analysis_jobs`` collection, so they survive a
+    restart: on startup, and then every ``ANALYSIS_JOB_STALE_SECONDS`` in
+    every process, running jobs whose heartbeat went stale are requeued and
+    queued jobs nobody has started in that long are scheduled here too.
+    Workers claim a job atomically before running it, so several API
+    processes can share the collection and a job scheduled twice still runs
+    once.
+    """
+
+    def __init__(self, backend: Optional[InProcessJobBackend] = None, workers: Optional[int] = None):
+        self.backend = backend or InProcessJobBackend(settings.ANALYSIS_JOB_TENANT_CONCURRENCY)
+        self.workers = workers or settings.ANALYSIS_JOB_WORKERS
+        self.db = None
+        self.collection = None
+        self._tasks = []
+        # Job ids waiting in this process's backend
+        self._scheduled = set()
+        self._updates: Dict[str, asyncio.Event] = {}
+
+    def bind(self, database: AsyncIOMotorDatabase):
+        self.db = database
+        self.collection = database.analysis_jobs
+
+    async def start(self):
+        """Index the collection, recover unfinished jobs and start the workers"""
+        await self.collection.create_index([("status", ASCENDING), ("updated_at", ASCENDING)])
+        await self._recover(startup=True)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._recover_periodically()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, request: AnalysisRequest, tenant: str) -> str:
+        """Persist a queued job and schedule it; returns the job id"""
+        now = datetime.utcnow()
+        job = {
+            "tenant": tenant,
+            "status": "queued",
+            "stage": None,
+            "request": request.dict(),
+            "partial": {},
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        inserted = await self.collection.insert_one(job)
+        job_id = str(inserted.inserted_id)
+        await self._schedule(job_id, tenant)
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        try:
+            doc = await self.collection.find_one({"_id": ObjectId(job_id)})
+        except (InvalidId, TypeError):
+            return None
+        if doc:
+            doc["id"] = str(doc.pop("_id"))
+            for section in (doc.get("partial"), doc.get("result")):
+                if section and "similarity_scores" in section:
+                    section["similarity_scores"] = unpack_matrix(section["similarity_scores"])
+        return doc
+
+    async def events(self, job_id: str) -> AsyncIterator[str]:
+        """Server-sent events for every status or stage change of a job until it finishes
+
+        A progress event carries the partial result of the stage that just
+        finished, without the similarity matrix; the full job, matrix and
+        final result included, is read with ``get``. Changes made by this
+        process wake the stream immediately; jobs run by another process are
+        picked up by polling.
+        """
+        try:
+            async for message in self._event_stream(job_id):
+                yield message
+        finally:
+            self._updates.pop(job_id, None)
+
+    async def _event_stream(self, job_id: str) -> AsyncIterator[str]:
+        last_state = None
+        while True:
+            event = self._updates.setdefault(job_id, asyncio.Event())
+            job = await self._event_fields(job_id)
+            if job is None:
+                yield _sse("error", {"detail": "Job not found"})
+                return
+            # Heartbeats only touch updated_at and are not sent
+            if (job["status"], job["stage"]) != last_state:
+                last_state = (job["status"], job["stage"])
+                name = job["status"] if job["status"] in TERMINAL_STATES else "progress"
+                if job["stage"]:
+                    job["partial"] = await self._stage_partial(job_id, job["stage"])
+                yield _sse(name, job)
+            if job["status"] in TERMINAL_STATES:
+                return
+            try:
+                await asyncio.wait_for(event.wait(), timeout=settings.ANALYSIS_JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            event.clear()
+
+    async def _event_fields(self, job_id: str) -> Optional[Dict]:
+        try:
+            doc = await self.collection.find_one({"_id": ObjectId(job_id)}, EVENT_FIELDS)
+        except (InvalidId, TypeError):
+            return None
+        if doc is None:
+            return None
+        doc["id"] = str(doc.pop("_id"))
+        return doc
+
+    async def _stage_partial(self, job_id: str, stage: str) -> Dict:
+        doc = await self.collection.find_one({"_id": ObjectId(job_id)}, {f"partial.{stage}": 1})
+        return doc.get("partial", {}) if doc else {}
+
+    async def _recover(self, startup: bool = False):
+        """Requeue stale running jobs and schedule queued jobs nobody picked up
+
+        On startup every queued job is scheduled; later passes only take jobs
+        queued for longer than the stale age, which were most likely waiting
+        in a process that died.
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.ANALYSIS_JOB_STALE_SECONDS)
+        # updated_at is left alone so the same pass schedules these
+        await self.collection.update_many(
+            {"status": "running", "updated_at": {"$lt": stale_before}},
+            {"$set": {"status": "queued", "stage": None}}
+        )
+        query = {"status": "queued"} if startup else {"status": "queued", "updated_at": {"$lt": stale_before}}
+        cursor = self.collection.find(query, {"tenant": 1}).sort("created_at", ASCENDING)
+        async for job in cursor:
+            await self._schedule(str(job["_id"]), job["tenant"])
+
+    async def _recover_periodically(self):
+        while True:
+            await asyncio.sleep(settings.ANALYSIS_JOB_STALE_SECONDS)
+            try:
+                await self._recover()
+            except Exception as e:
+                logging.error(f"Analysis job recovery failed: {str(e)}")
+
+    async def _schedule(self, job_id: str, tenant: str):
+        if job_id not in self._scheduled:
+            self._scheduled.add(job_id)
+            await self.backend.put(job_id, tenant)
+
+    async def _worker(self):
+        while True:
+            job_id, tenant = await self.backend.get()
+            self._scheduled.discard(job_id)
+            try:
+                await self._run(job_id, AnalysisService(self.db))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Analysis job {job_id} crashed: {str(e)}")
+            finally:
+                await self.backend.done(tenant)
+
+    async def _run(self, job_id: str, service: AnalysisService):
+        claimed = await self.collection.find_one_and_update(
+            {"_id": ObjectId(job_id), "status": "queued"},
+            {"$set": {"status": "running", "worker": os.getpid(), "updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not claimed:
+            # Already taken by another process, or finished
+            return
+        self._notify(job_id)
+
+        async def progress(stage: str, partial: Dict):
+            stored = storable_result(partial)
+            await self._update(job_id, {"stage": stage, **{f"partial.{k}": v for k, v in stored.items()}})
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            request = AnalysisRequest(**claimed["request"])
+            result = await service.perform_market_analysis(request, progress=progress)
+            await self._update(job_id, {"status": "completed", "stage": None, "result": storable_result(result)})
+        except Exception as e:
+            logging.error(f"Analysis job {job_id} failed: {str(e)}")
+            await self._update(job_id, {"status": "failed", "error": str(e)})
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str):
+        """Keep a running job's updated_at fresh so ``_recover`` leaves it alone"""
+        while True:
+            await asyncio.sleep(settings.ANALYSIS_JOB_HEARTBEAT_SECONDS)
+            try:
+                await self.collection.update_one(
+                    {"_id": ObjectId(job_id), "status": "running"},
+                    {"$set": {"updated_at": datetime.utcnow()}}
+                )
+            except Exception as e:
+                logging.error(f"Heartbeat for analysis job {job_id} failed: {str(e)}")
+
+    async def _update(self, job_id: str, fields: Dict):
+        await self.collection.update_one(
+            {"_id": ObjectId(job_id)},
+            {"$set": {**fields, "updated_at": datetime.utcnow()}}
+        )
+        self._notify(job_id)
+
+    def _notify(self, job_id: str):
+        event = self._updates.get(job_id)
+        if event is not None:
+            event.set()
+
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+# Create a queue instance for this process
+analysis_job_queue = AnalysisJobQueue()
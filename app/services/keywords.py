@@ -0,0 +1,271 @@
+# app/services/keywords.py
+import asyncio
+import logging
+import math
+import multiprocessing
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from ..config import settings
+from .utils import build_competitor_text, tokenize
+
+# The backfill starts while the embedding model loads on executor threads;
+# forking a multi-threaded process can deadlock the children, so pool
+# workers start from a clean process instead
+_POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+class TermStatistics:
+    """Incremental term and document frequencies, per competitor and overall
+
+    Only counters are kept, never the documents, so memory grows with the
+    vocabulary rather than the corpus. Statistics built in separate
+    processes combine with ``merge``.
+    """
+
+    def __init__(self):
+        self.documents: Counter = Counter()
+        self.term_counts: Dict[str, Counter] = {}
+        self.document_frequency: Dict[str, Counter] = {}
+        self.market_frequency: Counter = Counter()
+        self.total_documents = 0
+
+    def add_document(self, competitor_id: str, text: str, sign: int = 1):
+        terms = tokenize(text)
+        if not terms:
+            return
+        counts = Counter(terms)
+        distinct = Counter(counts.keys())
+        if sign < 0:
+            counts = Counter({term: -n for term, n in counts.items()})
+            distinct = Counter({term: -1 for term in distinct})
+
+        self.term_counts.setdefault(competitor_id, Counter()).update(counts)
+        self.document_frequency.setdefault(competitor_id, Counter()).update(distinct)
+        self.market_frequency.update(distinct)
+        self.documents[competitor_id] += sign
+        self.total_documents += sign
+        if sign < 0:
+            self._drop_empty(competitor_id, counts.keys())
+
+    def remove_document(self, competitor_id: str, text: str):
+        """Undo ``add_document`` for a text that changed or was deleted"""
+        if competitor_id in self.documents:
+            self.add_document(competitor_id, text, sign=-1)
+
+    def add_documents(self, documents: Iterable[Tuple[str, str]]):
+        for competitor_id, text in documents:
+            self.add_document(competitor_id, text)
+
+    def remove_competitor(self, competitor_id: str):
+        """Forget every document of a deleted competitor"""
+        frequency = self.document_frequency.pop(competitor_id, None)
+        if frequency:
+            self.market_frequency.subtract(frequency)
+            self.market_frequency = +self.market_frequency
+        self.term_counts.pop(competitor_id, None)
+        self.total_documents -= self.documents.pop(competitor_id, 0)
+
+    def merge(self, other: "TermStatistics"):
+        self.documents.update(other.documents)
+        self.market_frequency.update(other.market_frequency)
+        self.total_documents += other.total_documents
+        for competitor_id, counts in other.term_counts.items():
+            self.term_counts.setdefault(competitor_id, Counter()).update(counts)
+        for competitor_id, counts in other.document_frequency.items():
+            self.document_frequency.setdefault(competitor_id, Counter()).update(counts)
+
+    def keywords(self, competitor_id: str, top_n: int = 10) -> List[Dict]:
+        """TF-IDF ranked terms of a competitor's documents against the whole corpus"""
+        counts = self.term_counts.get(competitor_id)
+        if not counts:
+            return []
+        total_terms = sum(counts.values())
+        scored = [
+            (term, n / total_terms * (math.log((1 + self.total_documents) / (1 + self.market_frequency[term])) + 1))
+            for term, n in counts.items()
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return [
+            {"term": term, "score": score, "count": counts[term]}
+            for term, score in scored[:top_n]
+        ]
+
+    def distinguishing_terms(self, competitor_id: str, top_n: int = 10, min_documents: int = 2) -> List[Dict]:
+        """Terms over-represented in a competitor's documents vs the rest of the market
+
+        Ranked by the smoothed log ratio of the share of the competitor's
+        documents containing a term to the share of everyone else's.
+        """
+        frequency = self.document_frequency.get(competitor_id)
+        if not frequency:
+            return []
+        own_documents = self.documents[competitor_id]
+        rest_documents = self.total_documents - own_documents
+        scored = []
+        for term, own in frequency.items():
+            if own < min_documents:
+                continue
+            rest = self.market_frequency[term] - own
+            own_rate = (own + 0.5) / (own_documents + 1)
+            rest_rate = (rest + 0.5) / (rest_documents + 1)
+            scored.append((term, math.log(own_rate / rest_rate), own, rest))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return [
+            {"term": term, "score": score, "documents": own, "market_documents": rest}
+            for term, score, own, rest in scored[:top_n]
+        ]
+
+    def stats(self) -> Dict:
+        return {
+            "documents": self.total_documents,
+            "competitors": len(self.documents),
+            "vocabulary": len(self.market_frequency),
+        }
+
+    def _drop_empty(self, competitor_id: str, terms: Iterable[str]):
+        counters = (
+            self.term_counts[competitor_id],
+            self.document_frequency[competitor_id],
+            self.market_frequency,
+        )
+        for term in terms:
+            for counter in counters:
+                if counter[term] <= 0:
+                    del counter[term]
+        if self.documents[competitor_id] <= 0:
+            self.remove_competitor(competitor_id)
+
+
+def count_terms(documents: List[Tuple[str, str]]) -> TermStatistics:
+    """Statistics of one chunk; module-level so process pool workers can run it"""
+    statistics = TermStatistics()
+    statistics.add_documents(documents)
+    return statistics
+
+
+async def achunked(documents: AsyncIterator[Tuple[str, str]], size: int) -> AsyncIterator[List[Tuple[str, str]]]:
+    chunk: List[Tuple[str, str]] = []
+    async for document in documents:
+        chunk.append(document)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def build_statistics(
+        documents: AsyncIterator[Tuple[str, str]],
+        workers: int = 0,
+        chunk_size: int = 5000
+) -> TermStatistics:
+    """Count a (competitor_id, text) stream chunk by chunk
+
+    With ``workers`` > 1 chunks are tokenized in a process pool; at most two
+    chunks per worker are in flight, so memory stays bounded however long
+    the stream is.
+    """
+    statistics = TermStatistics()
+    if workers <= 1:
+        async for chunk in achunked(documents, chunk_size):
+            statistics.add_documents(chunk)
+            await asyncio.sleep(0)
+        return statistics
+
+    loop = asyncio.get_running_loop()
+    pending = set()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_POOL_CONTEXT) as pool:
+        async for chunk in achunked(documents, chunk_size):
+            pending.add(loop.run_in_executor(pool, count_terms, chunk))
+            if len(pending) >= workers * 2:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    statistics.merge(future.result())
+        for future in asyncio.as_completed(pending):
+            statistics.merge(await future)
+    return statistics
+
+
+async def iter_corpus(
+        database,
+        batch_size: int = 1000,
+        descriptions: Optional[Dict[str, str]] = None
+) -> AsyncIterator[Tuple[str, str]]:
+    """Competitor descriptions followed by every mention, as (competitor_id, text)
+
+    Descriptions are also recorded in ``descriptions`` when given, so they
+    can be swapped out when a competitor changes.
+    """
+    fields = {"name": 1, "description": 1, "price_range": 1, "strengths": 1}
+    async for doc in database.competitors.find({}, fields).batch_size(batch_size):
+        text = build_competitor_text(doc)
+        if descriptions is not None:
+            descriptions[str(doc["_id"])] = text
+        yield str(doc["_id"]), text
+    cursor = database.mentions.find({}, {"competitor_id": 1, "text": 1, "_id": 0})
+    async for doc in cursor.batch_size(batch_size):
+        yield doc["competitor_id"], doc.get("text", "")
+
+
+class KeywordEngine:
+    """Process-wide term statistics, backfilled once and updated on writes"""
+
+    def __init__(self):
+        self.statistics = TermStatistics()
+        # Current description text per competitor, to remove it when it changes
+        self.descriptions: Dict[str, str] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def ensure_loaded(self, database):
+        if self._loaded:
+            return
+        async with self._lock:
+            if self._loaded:
+                return
+            started = time.perf_counter()
+            self.descriptions = {}
+            self.statistics = await build_statistics(
+                iter_corpus(database, descriptions=self.descriptions),
+                workers=settings.KEYWORD_BACKFILL_WORKERS,
+                chunk_size=settings.KEYWORD_BACKFILL_CHUNK_SIZE
+            )
+            self._loaded = True
+            logging.info(
+                f"Indexed {self.statistics.total_documents} documents for keywords "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+
+    def add_documents(self, documents: Iterable[Tuple[str, str]]):
+        # Before the backfill finishes, it will pick these up from the database
+        if self._loaded:
+            self.statistics.add_documents(documents)
+
+    def sync_description(self, competitor_id: str, text: str):
+        """Make ``text`` the competitor's description; repeating it is a no-op"""
+        if not self._loaded:
+            return
+        previous = self.descriptions.get(competitor_id)
+        if previous == text:
+            return
+        if previous is not None:
+            self.statistics.remove_document(competitor_id, previous)
+        self.statistics.add_document(competitor_id, text)
+        self.descriptions[competitor_id] = text
+
+    def remove_competitor(self, competitor_id: str):
+        if self._loaded:
+            self.descriptions.pop(competitor_id, None)
+            self.statistics.remove_competitor(competitor_id)
+
+
+keyword_engine = KeywordEngine()
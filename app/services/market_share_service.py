@@ -0,0 +1,413 @@
+# app/services/market_share_service.py
+import asyncio
+import logging
+import warnings
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, UpdateOne
+
+from ..config import settings
+from .analysis_results import AnalysisResultStore
+
+
+def day_start(moment: datetime) -> datetime:
+    """Truncate a timestamp to its (UTC) day, the resolution of the history"""
+    return datetime(moment.year, moment.month, moment.day)
+
+
+# Rollup resolutions, finest first, with their approximate length in days
+RESOLUTIONS = {"day": 1, "week": 7, "month": 30.4375}
+
+
+def period_start(moment: datetime, resolution: str) -> datetime:
+    """Start of the day, ISO week (Monday) or month containing ``moment``"""
+    day = day_start(moment)
+    if resolution == "week":
+        return day - timedelta(days=day.weekday())
+    if resolution == "month":
+        return day.replace(day=1)
+    return day
+
+
+def period_index(moment: datetime, origin: datetime, resolution: str) -> int:
+    """Number of whole periods between the periods of ``origin`` and ``moment``"""
+    if resolution == "month":
+        return (moment.year - origin.year) * 12 + moment.month - origin.month
+    days = (period_start(moment, resolution) - period_start(origin, resolution)).days
+    return days // int(RESOLUTIONS[resolution])
+
+
+def choose_resolution(start_date: datetime, end_date: datetime, max_points: int) -> str:
+    """Finest resolution that keeps the window within ``max_points`` per competitor"""
+    span_days = max((day_start(end_date) - day_start(start_date)).days + 1, 1)
+    for resolution, days in RESOLUTIONS.items():
+        if span_days / days <= max_points:
+            return resolution
+    return "month"
+
+
+def share_trend_statistics(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """Least-squares slope, volatility and point count per row of a C x T grid
+
+    ``values[c, t]`` is competitor c's market share in period t of the window
+    (a day, week or month), NaN where there is no data. Everything is
+    computed for all rows at once; slope is per period.
+    """
+    observed = ~np.isnan(values)
+    counts = observed.sum(axis=1)
+    days = np.arange(values.shape[1], dtype=np.float64)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        filled = np.where(observed, values, 0.0)
+        day_mean = (observed * days).sum(axis=1) / counts
+        share_mean = filled.sum(axis=1) / counts
+        day_offsets = np.where(observed, days - day_mean[:, None], 0.0)
+        slope = (day_offsets * (filled - share_mean[:, None])).sum(axis=1) / (day_offsets ** 2).sum(axis=1)
+
+
+    # Spread of period-over-period changes between consecutive observed periods;
+    # rows with fewer than two changes would warn and yield NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        volatility = np.nan_to_num(np.nanstd(np.diff(values, axis=1), axis=1))
+
+    slope = np.where(counts >= 2, slope, np.nan)
+    return {"slope": slope, "volatility": volatility, "points": counts}
+
+
+def forward_fill(values: np.ndarray, initial: np.ndarray, last_period: int) -> np.ndarray:
+    """Carry each row's last known share forward through periods without a snapshot
+
+    Snapshots are only recorded when a share changes, so a missing period
+    means "unchanged", not "unknown". ``initial`` seeds rows with the value
+    in force before the window (NaN if none); periods after ``last_period``
+    (the future) are left empty.
+    """
+    values = values.copy()
+    seed = np.isnan(values[:, 0])
+    values[seed, 0] = initial[seed]
+    observed = ~np.isnan(values)
+    latest = np.where(observed, np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(latest, axis=1, out=latest)
+    filled = np.take_along_axis(values, latest, axis=1)
+    filled[:, last_period + 1:] = values[:, last_period + 1:]
+    return filled
+
+
+def classify_trends(slope: np.ndarray, span_periods: int, threshold: float) -> np.ndarray:
+    """Label rows growing, declining or stable by the fitted change over the window"""
+    change = slope * max(span_periods - 1, 1)
+    labels = np.full(slope.shape, "stable", dtype=object)
+    labels[change > threshold] = "growing"
+    labels[change < -threshold] = "declining"
+    labels[np.isnan(slope)] = "insufficient_data"
+    return labels
+
+
+class MarketShareService:
+    """Daily market-share snapshots per competitor and the trends built on them
+
+    Weekly and monthly rollups (count, sum, min, max, last value) are kept
+    next to the daily points. New days in the current period update them
+    incrementally; corrected or late-arriving points mark the period dirty and
+    ``compact_rollups`` rebuilds it from the daily data with a server-side
+    ``$merge``, so readers keep reading the previous rollup meanwhile.
+    """
+
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self.db = database
+        self.collection = self.db.market_share_history
+        self.rollups = self.db.market_share_rollups
+        self.dirty_rollups = self.db.market_share_rollup_dirty
+        self.results = AnalysisResultStore(self.db)
+
+    async def ensure_indexes(self):
+        """One snapshot per competitor per day, range-scannable by date"""
+        await self.collection.create_index(
+            [("competitor_id", ASCENDING), ("date", ASCENDING)],
+            unique=True
+        )
+        # Also the key $merge matches rollups on during compaction
+        await self.rollups.create_index(
+            [("competitor_id", ASCENDING), ("resolution", ASCENDING), ("period_start", ASCENDING)],
+            unique=True
+        )
+
+    async def record_snapshot(self, competitor_id: str, market_share: float, date: Optional[datetime] = None):
+        """Store (or replace) a competitor's share for the day of ``date``"""
+        await self.record_snapshots([{
+            "competitor_id": competitor_id,
+            "market_share": market_share,
+            "date": date,
+        }])
+
+    async def record_snapshots(self, snapshots: Iterable[Dict]):
+        """Upsert many daily snapshots with a single bulk_write, then roll them up"""
+        now = datetime.utcnow()
+        points = [
+            (str(snapshot["competitor_id"]), day_start(snapshot.get("date") or now), float(snapshot["market_share"]))
+            for snapshot in snapshots
+        ]
+        if not points:
+            return
+
+        operations = [
+            UpdateOne(
+                {"competitor_id": competitor_id, "date": date},
+                {"$set": {"market_share": share, "recorded_at": now}},
+                upsert=True
+            )
+            for competitor_id, date, share in points
+        ]
+        result = await self.collection.bulk_write(operations, ordered=False)
+        await self._update_rollups(points, set(result.upserted_ids), now)
+        # Stored analyses over these competitors now have outdated trends
+        await self.results.mark_stale(list({competitor_id for competitor_id, _, _ in points}))
+
+    async def _update_rollups(self, points: List[Tuple[str, datetime, float]], inserted: set, now: datetime):
+        incremental = []
+        touched = set()
+        dirty = {}
+        for index, (competitor_id, date, share) in enumerate(points):
+            for resolution in ("week", "month"):
+                start = period_start(date, resolution)
+                if index in inserted and start >= period_start(now, resolution):
+                    incremental.append(self._incremental_rollup(competitor_id, resolution, start, date, share, now))
+                    touched.add((competitor_id, resolution))
+                else:
+                    key = (competitor_id, resolution)
+                    dirty[key] = min(dirty.get(key, start), start)
+
+        if incremental:
+            # A compaction pass may have read the daily points before this
+            # insert; re-marking its dirty entry before the increment makes it
+            # keep the entry (and rebuild again) if its replace wins the race
+            await self.dirty_rollups.bulk_write([
+                UpdateOne(
+                    {"competitor_id": competitor_id, "resolution": resolution},
+                    {"$set": {"marked_at": now}}
+                )
+                for competitor_id, resolution in touched
+            ], ordered=False)
+            await self.rollups.bulk_write(incremental, ordered=False)
+        if dirty:
+            await self.dirty_rollups.bulk_write([
+                UpdateOne(
+                    {"competitor_id": competitor_id, "resolution": resolution},
+                    {"$min": {"from_period": start}, "$set": {"marked_at": now}},
+                    upsert=True
+                )
+                for (competitor_id, resolution), start in dirty.items()
+            ], ordered=False)
+
+    def _incremental_rollup(
+            self,
+            competitor_id: str,
+            resolution: str,
+            start: datetime,
+            date: datetime,
+            share: float,
+            now: datetime
+    ) -> UpdateOne:
+        return UpdateOne(
+            {"competitor_id": competitor_id, "resolution": resolution, "period_start": start},
+            [{"$set": {
+                "count": {"$add": [{"$ifNull": ["$count", 0]}, 1]},
+                "sum": {"$add": [{"$ifNull": ["$sum", 0]}, share]},
+                "min": {"$min": [{"$ifNull": ["$min", share]}, share]},
+                "max": {"$max": [{"$ifNull": ["$max", share]}, share]},
+                "last": {"$cond": [
+                    {"$gte": [date, {"$ifNull": ["$last_date", date]}]},
+                    share,
+                    "$last"
+                ]},
+                "last_date": {"$max": [{"$ifNull": ["$last_date", date]}, date]},
+                "updated_at": now,
+            }}],
+            upsert=True
+        )
+
+    async def compact_rollups(self, batch_size: int = 500) -> int:
+        """Rebuild dirty rollup periods from the daily points; returns entries processed"""
+        processed = 0
+        while True:
+            dirty = await self.dirty_rollups.find({}).limit(batch_size).to_list(length=batch_size)
+            if not dirty:
+                return processed
+
+            for resolution in ("week", "month"):
+                entries = [entry for entry in dirty if entry["resolution"] == resolution]
+                if entries:
+                    await self._rebuild_rollups(resolution, entries)
+
+            # Entries marked again while we were rebuilding stay for the next pass
+            await self.dirty_rollups.delete_many({"$or": [
+                {"_id": entry["_id"], "marked_at": entry["marked_at"]} for entry in dirty
+            ]})
+            processed += len(dirty)
+            if len(dirty) < batch_size:
+                return processed
+
+    async def _rebuild_rollups(self, resolution: str, entries: List[Dict]):
+        truncate = {"date": "$date", "unit": resolution}
+        if resolution == "week":
+            truncate["startOfWeek"] = "monday"
+        pipeline = [
+            {"$match": {"$or": [
+                {"competitor_id": entry["competitor_id"], "date": {"$gte": entry["from_period"]}}
+                for entry in entries
+            ]}},
+            {"$sort": {"date": 1}},
+            {"$group": {
+                "_id": {"competitor_id": "$competitor_id", "period_start": {"$dateTrunc": truncate}},
+                "count": {"$sum": 1},
+                "sum": {"$sum": "$market_share"},
+                "min": {"$min": "$market_share"},
+                "max": {"$max": "$market_share"},
+                "last": {"$last": "$market_share"},
+                "last_date": {"$last": "$date"},
+            }},
+            {"$project": {
+                "_id": 0,
+                "competitor_id": "$_id.competitor_id",
+                "resolution": {"$literal": resolution},
+                "period_start": "$_id.period_start",
+                "count": 1,
+                "sum": 1,
+                "min": 1,
+                "max": 1,
+                "last": 1,
+                "last_date": 1,
+                "updated_at": "$$NOW",
+            }},
+            {"$merge": {
+                "into": self.rollups.name,
+                "on": ["competitor_id", "resolution", "period_start"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }},
+        ]
+        async for _ in self.collection.aggregate(pipeline):
+            pass
+
+    async def get_history(
+            self,
+            competitor_ids: List[str],
+            start_date: datetime,
+            end_date: datetime,
+            resolution: str = "day"
+    ) -> Dict[str, Dict]:
+        """Points of every requested competitor in one aggregation round trip
+
+        Daily points come from the raw history; weekly and monthly points are
+        the mean of the matching rollups. ``previous`` is the competitor's
+        last daily share before ``start_date`` (or None), which seeds the
+        forward fill; it is read through ``$unionWith`` so both parts are
+        served by the (competitor_id, date) index.
+        """
+        if resolution == "day":
+            collection = self.collection
+            match = {"date": {"$gte": day_start(start_date), "$lte": end_date}}
+            date_field, share = "$date", "$market_share"
+        else:
+            collection = self.rollups
+            match = {
+                "resolution": resolution,
+                "period_start": {"$gte": period_start(start_date, resolution), "$lte": end_date},
+            }
+            date_field, share = "$period_start", {"$divide": ["$sum", "$count"]}
+
+        competitor_ids = list(competitor_ids)
+        pipeline = [
+            {"$match": {"competitor_id": {"$in": competitor_ids}, **match}},
+            {"$sort": {date_field[1:]: 1}},
+            {"$group": {
+                "_id": "$competitor_id",
+                "dates": {"$push": date_field},
+                "shares": {"$push": share},
+            }},
+            {"$unionWith": {
+                "coll": self.collection.name,
+                "pipeline": [
+                    {"$match": {"competitor_id": {"$in": competitor_ids}, "date": {"$lt": day_start(start_date)}}},
+                    # In index order, so $last needs no in-memory sort
+                    {"$sort": {"competitor_id": 1, "date": 1}},
+                    {"$group": {"_id": "$competitor_id", "previous": {"$last": "$market_share"}}},
+                ],
+            }},
+        ]
+        history = {}
+        async for row in collection.aggregate(pipeline):
+            series = history.setdefault(row["_id"], {"dates": [], "shares": [], "previous": None})
+            if "previous" in row:
+                series["previous"] = row["previous"]
+            else:
+                series["dates"], series["shares"] = row["dates"], row["shares"]
+        return history
+
+    async def calculate_trends(
+            self,
+            competitor_ids: List[str],
+            start_date: datetime,
+            end_date: datetime
+    ) -> Dict:
+        """Classify, and report slope and volatility for, every competitor at once"""
+        resolution = choose_resolution(start_date, end_date, settings.MARKET_SHARE_MAX_POINTS)
+        history = await self.get_history(competitor_ids, start_date, end_date, resolution)
+
+        span_periods = period_index(end_date, start_date, resolution) + 1
+        grid = np.full((len(competitor_ids), span_periods), np.nan)
+        initial = np.full(len(competitor_ids), np.nan)
+        for row, competitor_id in enumerate(competitor_ids):
+            series = history.get(competitor_id)
+            if series:
+                offsets = [period_index(date, start_date, resolution) for date in series["dates"]]
+                grid[row, offsets] = series["shares"]
+                if series["previous"] is not None:
+                    initial[row] = series["previous"]
+        current_period = period_index(datetime.utcnow(), start_date, resolution)
+        grid = forward_fill(grid, initial, current_period)
+
+        statistics = share_trend_statistics(grid)
+        labels = classify_trends(statistics["slope"], span_periods, settings.MARKET_SHARE_STABLE_THRESHOLD)
+
+        competitors = {}
+        for row, competitor_id in enumerate(competitor_ids):
+            observed = grid[row][~np.isnan(grid[row])]
+            slope = statistics["slope"][row]
+            competitors[competitor_id] = {
+                "trend": labels[row],
+                "slope_per_day": None if np.isnan(slope) else float(slope / RESOLUTIONS[resolution]),
+                "volatility": float(statistics["volatility"][row]),
+                "points": int(statistics["points"][row]),
+                "start_share": float(observed[0]) if observed.size else None,
+                "end_share": float(observed[-1]) if observed.size else None,
+            }
+
+        return {
+            "trend_period": f"{start_date.date()} to {end_date.date()}",
+            "resolution": resolution,
+            "trends": {
+                label: int(np.sum(labels == label))
+                for label in ("growing", "declining", "stable")
+            },
+            "competitors": competitors,
+        }
+
+
+async def run_rollup_compaction(database: AsyncIOMotorDatabase, interval_seconds: float):
+    """Background loop that folds late or corrected snapshots into the rollups"""
+    service = MarketShareService(database)
+    while True:
+        try:
+            processed = await service.compact_rollups()
+            if processed:
+                logging.info(f"Rebuilt {processed} dirty market-share rollups")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Market-share rollup compaction failed: {str(e)}")
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,123 @@
+# app/services/mention_service.py
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from ..config import settings
+from ..models.schemas import MentionCreate
+from .embedding_engine import embedding_engine
+from .keywords import keyword_engine
+from .sentiment import sentiment_engine
+
+# Scores above / below these count as positive / negative in the histogram
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
+
+def sentiment_bucket(score: float) -> str:
+    if score > POSITIVE_THRESHOLD:
+        return "positive"
+    if score < NEGATIVE_THRESHOLD:
+        return "negative"
+    return "neutral"
+
+
+class MentionService:
+    """Mentions of competitors, scored once on ingest, with running aggregates
+
+    Each ingest batch is scored in one call to the sentiment engine, stored
+    in ``mentions``, and folded into one ``mention_aggregates`` document per
+    competitor (totals, a positive/neutral/negative histogram and per-day
+    counts and sums) with ``$inc``. Sentiment queries read that document
+    instead of re-scoring mentions.
+    """
+
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self.db = database
+        self.collection = self.db.mentions
+        self.aggregates = self.db.mention_aggregates
+
+    async def ensure_indexes(self):
+        await self.collection.create_index(
+            [("competitor_id", ASCENDING), ("published_at", ASCENDING)]
+        )
+
+    async def ingest_mentions(self, mentions: List[MentionCreate]) -> Dict:
+        """Score, store and aggregate a batch of mentions"""
+        if not mentions:
+            return {"ingested": 0}
+
+        texts = [mention.text for mention in mentions]
+        if settings.SENTIMENT_MODE == "embedding":
+            embeddings = await embedding_engine.encode(texts)
+            scores = await sentiment_engine.score_embeddings(embeddings, embedding_engine)
+        else:
+            scores = sentiment_engine.score_texts(texts)
+
+        now = datetime.utcnow()
+        docs = []
+        increments: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for mention, score in zip(mentions, scores.tolist()):
+            doc = mention.dict()
+            doc.update({"sentiment": score, "ingested_at": now})
+            docs.append(doc)
+
+            day = mention.published_at.strftime("%Y-%m-%d")
+            totals = increments[mention.competitor_id]
+            totals["count"] += 1
+            totals["sentiment_sum"] += score
+            totals[f"histogram.{sentiment_bucket(score)}"] += 1
+            totals[f"daily.{day}.count"] += 1
+            totals[f"daily.{day}.sentiment_sum"] += score
+
+        await self.collection.insert_many(docs, ordered=False)
+        keyword_engine.add_documents((mention.competitor_id, mention.text) for mention in mentions)
+        await self.aggregates.bulk_write([
+            UpdateOne(
+                {"_id": competitor_id},
+                {"$inc": dict(totals), "$set": {"updated_at": now}},
+                upsert=True
+            )
+            for competitor_id, totals in increments.items()
+        ], ordered=False)
+        return {"ingested": len(docs), "competitors": len(increments)}
+
+    async def get_sentiment_summary(self, competitor_id: str) -> Dict:
+        """Mention count, mean sentiment and histograms from the running aggregate"""
+        aggregate = await self.aggregates.find_one({"_id": competitor_id}) or {}
+        count = int(aggregate.get("count", 0))
+        return {
+            "mention_count": count,
+            "sentiment_score": aggregate.get("sentiment_sum", 0) / count if count else 0,
+            "sentiment_histogram": {
+                bucket: int(value) for bucket, value in aggregate.get("histogram", {}).items()
+            },
+            "daily": {
+                day: {"count": int(values["count"]), "sentiment": values["sentiment_sum"] / values["count"]}
+                for day, values in sorted(aggregate.get("daily", {}).items())
+                if values.get("count")
+            },
+        }
+
+    async def get_recent_mentions(self, competitor_id: str, limit: int = 50) -> List[Dict]:
+        cursor = self.collection.find({"competitor_id": competitor_id})
+        cursor = cursor.sort("published_at", DESCENDING).limit(limit)
+        mentions = []
+        async for doc in cursor:
+            doc["id"] = str(doc.pop("_id"))
+            mentions.append(doc)
+        return mentions
+
+    async def iter_mention_texts(
+            self,
+            competitor_id: Optional[str] = None,
+            batch_size: int = 1000
+    ) -> AsyncIterator[Dict]:
+        """Stream (competitor_id, text) documents without loading them all"""
+        query = {"competitor_id": competitor_id} if competitor_id else {}
+        cursor = self.collection.find(query, {"competitor_id": 1, "text": 1, "_id": 0})
+        async for doc in cursor.batch_size(batch_size):
+            yield doc
@@ -0,0 +1,108 @@
+# app/services/model_registry.py
+import asyncio
+import logging
+import resource
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from ..config import settings
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+
+def _resident_memory_mb() -> float:
+    """Return the current resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() / (1024 * 1024)
+    except (OSError, IndexError, ValueError):
+        # Not on Linux: fall back to the peak RSS reported by getrusage
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class ModelRegistry:
+    """Process-wide holder for embedding models, loaded once and shared
+
+    sentence_transformers (and torch) are imported on the first load, so
+    processes that never encode do not pay for them.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, "SentenceTransformer"] = {}
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def load(self, model_name: str, warmup: bool = False) -> "SentenceTransformer":
+        """Load a model if it is not loaded yet and return the shared instance"""
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+        # Background warm-up and a first request may race to load the same model
+        with self._lock:
+            if model_name in self._models:
+                return self._models[model_name]
+            return self._load(model_name, warmup)
+
+    def _load(self, model_name: str, warmup: bool) -> "SentenceTransformer":
+        rss_before = _resident_memory_mb()
+        started = time.perf_counter()
+        from sentence_transformers import SentenceTransformer
+        import_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        model = SentenceTransformer(model_name)
+        load_seconds = time.perf_counter() - started
+
+        warmup_seconds = None
+        if warmup:
+            started = time.perf_counter()
+            model.encode(["warm up"])
+            warmup_seconds = time.perf_counter() - started
+
+        rss_after = _resident_memory_mb()
+        self._models[model_name] = model
+        self._stats[model_name] = {
+            "import_seconds": round(import_seconds, 3),
+            "load_seconds": round(load_seconds, 3),
+            "warmup_seconds": round(warmup_seconds, 3) if warmup_seconds is not None else None,
+            "resident_memory_mb": round(rss_after, 1),
+            "resident_memory_delta_mb": round(rss_after - rss_before, 1),
+        }
+        logging.info(f"Loaded embedding model {model_name}: {self._stats[model_name]}")
+        return model
+
+    def load_all(self, model_names: Optional[List[str]] = None, warmup: bool = False):
+        """Load every configured model, typically from the startup hook"""
+        for name in model_names or settings.EMBEDDING_MODELS:
+            self.load(name, warmup=warmup)
+
+    async def warm_up(self, model_names: Optional[List[str]] = None, warmup: bool = False):
+        """Load models on a worker thread so startup does not wait for them"""
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.load_all, model_names, warmup
+            )
+        except Exception as e:
+            # Models are loaded again on first use; keep serving CRUD meanwhile
+            logging.error(f"Embedding model warm-up failed: {str(e)}")
+
+    def is_loaded(self, model_name: Optional[str] = None) -> bool:
+        return (model_name or settings.EMBEDDING_MODEL) in self._models
+
+    def get(self, model_name: Optional[str] = None) -> "SentenceTransformer":
+        """Return the shared model, loading it on first use if startup did not"""
+        return self.load(model_name or settings.EMBEDDING_MODEL)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Load time and memory figures for every loaded model"""
+        return dict(self._stats)
+
+
+# Create a registry instance
+model_registry = ModelRegistry()
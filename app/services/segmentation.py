@@ -0,0 +1,199 @@
+# app/services/segmentation.py
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from ..config import settings
+from .vector_index import normalize_rows
+
+
+def init_centroids(vectors: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++ seeding with cosine distance"""
+    centroids = np.empty((k, vectors.shape[1]), dtype=np.float32)
+    centroids[0] = vectors[rng.integers(len(vectors))]
+    distance = 1 - vectors @ centroids[0]
+    for i in range(1, k):
+        weights = np.clip(distance, 0, None)
+        total = weights.sum()
+        row = rng.choice(len(vectors), p=weights / total) if total > 0 else rng.integers(len(vectors))
+        centroids[i] = vectors[row]
+        distance = np.minimum(distance, 1 - vectors @ centroids[i])
+    return centroids
+
+
+def assign_segments(
+        vectors: np.ndarray,
+        centroids: np.ndarray,
+        block_rows: int = 4096
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Nearest centroid of every row and its cosine similarity, block by block"""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    similarity = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), block_rows):
+        scores = vectors[start:start + block_rows] @ centroids.T
+        best = np.argmax(scores, axis=1)
+        labels[start:start + len(best)] = best
+        similarity[start:start + len(best)] = scores[np.arange(len(best)), best]
+    return labels, similarity
+
+
+def minibatch_kmeans(
+        vectors: np.ndarray,
+        k: int,
+        batch_size: int = 1024,
+        iterations: int = 100,
+        tol: float = 1e-4,
+        seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Spherical mini-batch k-means; returns unit centroids and per-centroid counts
+
+    Each step assigns one random batch and moves every centroid toward the
+    mean of its batch members with a learning rate of 1/count, so working
+    memory is O(batch_size x k) whatever the number of vectors.
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    seed_rows = rng.choice(len(vectors), min(len(vectors), max(batch_size, 20 * k)), replace=False)
+    centroids = init_centroids(vectors[seed_rows], k, rng)
+    counts = np.zeros(k)
+    for _ in range(iterations):
+        batch = vectors[rng.integers(len(vectors), size=min(batch_size, len(vectors)))]
+        labels = np.argmax(batch @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, batch)
+        batch_counts = np.bincount(labels, minlength=k)
+        counts += batch_counts
+        hit = batch_counts > 0
+        previous = centroids
+        centroids = centroids.copy()
+        centroids[hit] += (sums[hit] - batch_counts[hit, None] * centroids[hit]) / counts[hit, None]
+        centroids = normalize_rows(centroids)
+        if np.max(1 - np.sum(previous * centroids, axis=1)) < tol:
+            break
+    return centroids, counts
+
+
+class MarketSegmentation:
+    """Competitors partitioned into k segments, kept current as vectors change
+
+    ``fit`` runs mini-batch k-means over the whole embedding matrix. After
+    that, a created or updated competitor is assigned to its nearest
+    centroid, which takes one online k-means step toward it, and a deleted
+    one just loses its assignment. Once more distinct competitors have
+    changed than ``refit_fraction`` of the fitted size the segmentation is
+    ``stale`` and the next read refits it.
+    """
+
+    def __init__(self, k: int, refit_fraction: Optional[float] = None, seed: int = 0):
+        self.k = k
+        self.refit_fraction = (
+            settings.SEGMENTATION_REFIT_FRACTION if refit_fraction is None else refit_fraction
+        )
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.counts: Optional[np.ndarray] = None
+        self.labels: Dict[str, int] = {}
+        self.fitted_size = 0
+        self.changed: Set[str] = set()
+
+    @property
+    def changes(self) -> int:
+        return len(self.changed)
+
+    @property
+    def stale(self) -> bool:
+        return self.centroids is None or self.changes > self.refit_fraction * max(self.fitted_size, 1)
+
+    def fit(self, ids: List[str], vectors: np.ndarray):
+        self.centroids, self.counts = minibatch_kmeans(
+            vectors, self.k, batch_size=settings.SEGMENTATION_BATCH_SIZE, seed=self.seed
+        )
+        labels, _ = assign_segments(vectors, self.centroids)
+        self.labels = dict(zip(ids, labels.tolist()))
+        # Online updates then keep each centroid close to its members' mean
+        self.counts = np.bincount(labels, minlength=len(self.centroids)).astype(np.float64)
+        self.fitted_size = len(ids)
+        self.changed = set()
+
+    def add(self, ids: List[str], vectors: np.ndarray):
+        """Assign new or changed competitors; ``vectors`` must be normalized
+
+        Pass only competitors whose vector actually changed: re-adding an
+        unchanged one would pull its centroid toward it again.
+        """
+        if self.centroids is None:
+            return
+        labels, _ = assign_segments(vectors, self.centroids)
+        for competitor_id, vector, label in zip(ids, vectors, labels.tolist()):
+            if self.labels.get(competitor_id) != label:
+                self.counts[label] += 1
+            centroid = self.centroids[label] + (vector - self.centroids[label]) / self.counts[label]
+            self.centroids[label] = centroid / (np.linalg.norm(centroid) or 1)
+            self.labels[competitor_id] = label
+            self.changed.add(competitor_id)
+
+    def remove(self, competitor_id: str):
+        if self.labels.pop(competitor_id, None) is not None:
+            self.changed.add(competitor_id)
+
+    def describe(self, ids: List[str], vectors: np.ndarray, names: Dict[str, str]) -> Dict:
+        """Segments with their members, in O(competitors x dimension)
+
+        A member's ``uniqueness_score`` is one minus its mean similarity to
+        the rest of its segment, computed from the segment's vector sum
+        rather than pairwise; ``cohesion`` is the segment's mean pairwise
+        similarity.
+        """
+        k = len(self.centroids)
+        labels = np.array([self.labels[competitor_id] for competitor_id in ids], dtype=np.int32)
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(k + 1))
+        sums = np.zeros((k, vectors.shape[1]), dtype=np.float64)
+        for segment_id in range(k):
+            rows = order[bounds[segment_id]:bounds[segment_id + 1]]
+            sums[segment_id] = vectors[rows].sum(axis=0, dtype=np.float64)
+
+        # n x k products instead of gathering an n x dimension array per row
+        rows = np.arange(len(ids))
+        self_similarity = np.einsum("ij,ij->i", vectors, vectors)
+        sizes = bounds[1:] - bounds[:-1]
+        others = np.maximum(sizes[labels] - 1, 1)
+        mean_similarity = ((vectors @ sums.T.astype(vectors.dtype))[rows, labels] - self_similarity) / others
+        uniqueness = np.where(sizes[labels] > 1, 1 - mean_similarity, 1.0)
+        centroid_similarity = (vectors @ self.centroids.T)[rows, labels]
+        uniqueness_scores = uniqueness.tolist()
+        centroid_scores = centroid_similarity.tolist()
+
+        segments = []
+        for segment_id in range(k):
+            rows = order[bounds[segment_id]:bounds[segment_id + 1]]
+            rows = rows[np.argsort(-centroid_similarity[rows], kind="stable")]
+            size = len(rows)
+            cohesion = None
+            if size > 1:
+                pairwise = sums[segment_id] @ sums[segment_id] - self_similarity[rows].sum()
+                cohesion = float(pairwise / (size * (size - 1)))
+            segments.append({
+                "segment_id": segment_id,
+                "size": int(size),
+                "cohesion": cohesion,
+                # Most representative (closest to the centroid) first
+                "members": [
+                    {
+                        "competitor_id": ids[row],
+                        "name": names.get(ids[row], ""),
+                        "uniqueness_score": uniqueness_scores[row],
+                        "centroid_similarity": centroid_scores[row],
+                    }
+                    for row in rows.tolist()
+                ],
+            })
+        return {
+            "k": k,
+            "competitors": len(ids),
+            "fitted_size": self.fitted_size,
+            "changes_since_fit": self.changes,
+            # Online updates keep moving the live centroids
+            "centroids": self.centroids.copy(),
+            "segments": segments,
+        }
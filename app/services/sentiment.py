@@ -0,0 +1,184 @@
+# app/services/sentiment.py
+import logging
+from itertools import repeat
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ..config import settings
+from .vector_index import normalize_rows
+
+# Built-in weighted lexicon (AFINN-style, -3..3) tuned for product and
+# company mentions. SENTIMENT_LEXICON_PATH can extend or override it.
+DEFAULT_LEXICON: Dict[str, float] = {
+    # strongly positive
+    "amazing": 3, "awesome": 3, "excellent": 3, "exceptional": 3, "fantastic": 3,
+    "flawless": 3, "love": 3, "loved": 3, "loves": 3, "outstanding": 3,
+    "perfect": 3, "phenomenal": 3, "superb": 3, "wonderful": 3, "brilliant": 3,
+    "best": 3, "incredible": 3, "stellar": 3, "delighted": 3, "thrilled": 3,
+    # positive
+    "good": 2, "great": 2, "nice": 2, "happy": 2, "pleased": 2,
+    "impressive": 2, "impressed": 2, "reliable": 2, "recommend": 2, "recommended": 2,
+    "fast": 1, "quick": 1, "easy": 2, "intuitive": 2, "helpful": 2,
+    "responsive": 2, "efficient": 2, "affordable": 2, "satisfied": 2, "smooth": 2,
+    "seamless": 2, "powerful": 2, "robust": 2, "stable": 1, "secure": 1,
+    "innovative": 2, "friendly": 2, "valuable": 2, "worth": 1, "enjoy": 2,
+    "enjoyed": 2, "like": 1, "liked": 1, "likes": 1, "favorite": 2,
+    "favourite": 2, "solid": 1, "useful": 2, "convenient": 2, "clean": 1,
+    "polished": 2, "professional": 1, "improved": 1, "improvement": 1, "improvements": 1,
+    "better": 1, "praise": 2, "praised": 2, "trust": 1, "trusted": 2,
+    "trustworthy": 2, "accurate": 1, "consistent": 1, "flexible": 1, "scalable": 1,
+    "simple": 1, "elegant": 2, "beautiful": 2, "cheap": 1, "value": 1,
+    "win": 2, "wins": 2, "winner": 2, "success": 2, "successful": 2,
+    "growth": 1, "growing": 1, "leader": 1, "leading": 1, "popular": 1,
+    "loyal": 2, "superior": 2, "top": 1, "premium": 1, "quality": 1,
+    "thanks": 1, "thank": 1, "appreciate": 2, "appreciated": 2, "glad": 2,
+    "excited": 2, "exciting": 2, "fun": 2, "fixed": 1, "resolved": 1,
+    "works": 1, "working": 1, "worked": 1, "upgrade": 1, "wow": 2,
+    # negative
+    "bad": -2, "poor": -2, "slow": -1, "expensive": -1, "overpriced": -2,
+    "buggy": -2, "bug": -1, "bugs": -1, "glitch": -1, "glitches": -1,
+    "crash": -2, "crashes": -2, "crashed": -2, "crashing": -2, "error": -1,
+    "errors": -1, "fail": -2, "fails": -2, "failed": -2, "failure": -2,
+    "broken": -2, "broke": -2, "issue": -1, "issues": -1, "problem": -1,
+    "problems": -1, "difficult": -1, "hard": -1, "confusing": -2, "complicated": -1,
+    "clunky": -2, "unreliable": -2, "unstable": -2, "unresponsive": -2, "unhelpful": -2,
+    "annoying": -2, "annoyed": -2, "frustrating": -2, "frustrated": -2, "disappointed": -2,
+    "disappointing": -2, "unhappy": -2, "dissatisfied": -2, "complaint": -1, "complaints": -1,
+    "complain": -1, "lacking": -1, "lacks": -1, "missing": -1, "outdated": -1,
+    "limited": -1, "mediocre": -1, "meh": -1, "downtime": -2, "outage": -2,
+    "outages": -2, "lag": -1, "laggy": -2, "delay": -1, "delays": -1,
+    "delayed": -1, "costly": -1, "hidden": -1, "ripoff": -3, "scam": -3,
+    "fraud": -3, "insecure": -2, "breach": -3, "leak": -2, "leaked": -2,
+    "vulnerable": -2, "vulnerability": -2, "rude": -2, "ignored": -2, "worse": -2,
+    "decline": -1, "declining": -1, "losing": -1, "lost": -1, "loss": -1,
+    "churn": -1, "cancel": -1, "cancelled": -1, "canceled": -1, "refund": -1,
+    "waste": -2, "wasted": -2, "useless": -2, "pointless": -2, "regret": -2,
+    "hate": -3, "hated": -3, "hates": -3, "awful": -3, "terrible": -3,
+    "horrible": -3, "worst": -3, "pathetic": -3, "disaster": -3, "nightmare": -3,
+    "unusable": -3, "garbage": -3, "trash": -3, "abysmal": -3, "atrocious": -3,
+    "avoid": -2, "beware": -2, "misleading": -2, "deceptive": -2, "sucks": -3,
+}
+
+# Words that flip the polarity of the next few tokens
+NEGATIONS = {
+    "not", "no", "never", "none", "nobody", "nothing", "neither", "nor", "without",
+    "hardly", "barely", "cannot", "cant", "can't", "dont", "don't", "doesnt", "doesn't",
+    "didnt", "didn't", "isnt", "isn't", "wasnt", "wasn't", "arent", "aren't", "werent",
+    "weren't", "wont", "won't", "wouldnt", "wouldn't", "shouldnt", "shouldn't",
+    "couldnt", "couldn't", "aint", "ain't", "havent", "haven't", "hasnt", "hasn't",
+}
+NEGATION_WINDOW = 3
+# Negated sentiment is flipped and damped ("not great" is milder than "bad")
+NEGATION_SCALAR = -0.74
+
+# Anchor phrases whose embeddings define the positive and negative poles
+POSITIVE_ANCHORS = [
+    "I love this product, it works great",
+    "Excellent service and very reliable",
+    "Highly recommended, best value on the market",
+]
+NEGATIVE_ANCHORS = [
+    "I hate this product, it is terrible",
+    "Awful support and constant problems",
+    "A waste of money, would not recommend",
+]
+
+_SEPARATOR = "\x01"
+# Everything but lowercase letters, apostrophes and the separator becomes a
+# space, so str.translate + str.split tokenizes in C at memory speed
+_TOKEN_TABLE = {
+    code: " " for code in range(128)
+    if not ("a" <= chr(code) <= "z" or chr(code) in ("'", _SEPARATOR))
+}
+_TOKEN_TABLE.update({ord("\u2019"): "'", ord("\u2018"): "'"})
+_TOKEN_TABLE.update({ord(char): " " for char in "\u201c\u201d\u2013\u2014\u2026\u00a0"})
+
+
+def load_lexicon(path: Optional[str] = None) -> Dict[str, float]:
+    """Built-in lexicon, extended by a tab-separated "word<TAB>weight" file"""
+    lexicon = dict(DEFAULT_LEXICON)
+    if path:
+        with open(path, encoding="utf-8") as lexicon_file:
+            for line in lexicon_file:
+                word, _, weight = line.rstrip("\n").rpartition("\t")
+                if word:
+                    lexicon[word.lower()] = float(weight)
+        logging.info(f"Loaded sentiment lexicon with {len(lexicon)} entries from {path}")
+    return lexicon
+
+
+class SentimentEngine:
+    """Batch sentiment scoring, lexicon-based or from precomputed embeddings
+
+    Lexicon mode tokenizes a whole batch in one pass over the joined texts,
+    maps tokens to lexicon ids, applies negation with shifted boolean masks
+    and sums weights per text with ``np.bincount`` (the product of the
+    sparse text-by-token incidence matrix with the weight vector). Scores are
+    in [-1, 1]: net weight over total absolute weight, 0 without any hit.
+    """
+
+    def __init__(self, lexicon: Optional[Dict[str, float]] = None):
+        lexicon = lexicon if lexicon is not None else load_lexicon(settings.SENTIMENT_LEXICON_PATH)
+        # Id 0 is "not in the lexicon", id 1 the text separator
+        words = [word for word in lexicon if word not in NEGATIONS]
+        self._ids = {_SEPARATOR: 1}
+        self._ids.update({word: i + 2 for i, word in enumerate(words)})
+        negation_start = len(words) + 2
+        self._ids.update({word: negation_start + i for i, word in enumerate(sorted(NEGATIONS))})
+
+        self._weights = np.zeros(negation_start + len(NEGATIONS), dtype=np.float64)
+        self._weights[2:negation_start] = [lexicon[word] for word in words]
+        self._negation_start = negation_start
+        self._anchors: Optional[np.ndarray] = None
+
+    def score_texts(self, texts: List[str]) -> np.ndarray:
+        """Lexicon sentiment of every text, computed for the batch at once"""
+        if not texts:
+            return np.zeros(0)
+        # A separator inside a text would shift every later text boundary
+        corpus = f" {_SEPARATOR} ".join(text.replace(_SEPARATOR, " ") for text in texts).lower()
+        tokens = corpus.translate(_TOKEN_TABLE).split()
+        ids = np.fromiter(map(self._ids.get, tokens, repeat(0)), dtype=np.int32, count=len(tokens))
+
+        separators = ids == 1
+        text_ids = np.cumsum(separators)
+        negators = ids >= self._negation_start
+
+        # A token is negated if one of the previous few tokens of the same
+        # text is a negation word
+        negated = np.zeros(len(ids), dtype=bool)
+        for shift in range(1, NEGATION_WINDOW + 1):
+            if shift >= len(ids):
+                break
+            negated[shift:] |= negators[:-shift] & (text_ids[shift:] == text_ids[:-shift])
+
+        weights = self._weights[ids] * np.where(negated, NEGATION_SCALAR, 1.0)
+        net = np.bincount(text_ids, weights=weights, minlength=len(texts))
+        total = np.bincount(text_ids, weights=np.abs(weights), minlength=len(texts))
+        return np.divide(net, total, out=np.zeros(len(texts)), where=total > 0)
+
+    async def score_embeddings(self, embeddings: np.ndarray, encoder) -> np.ndarray:
+        """Sentiment from embeddings already computed for the texts
+
+        Each embedding is compared with the mean embedding of positive and of
+        negative anchor phrases; the score is the difference of the two cosine
+        similarities, rescaled to [-1, 1].
+        """
+        if len(embeddings) == 0:
+            return np.zeros(0)
+        if self._anchors is None:
+            anchors = await encoder.encode(POSITIVE_ANCHORS + NEGATIVE_ANCHORS)
+            positive = normalize_rows(anchors[:len(POSITIVE_ANCHORS)]).mean(axis=0)
+            negative = normalize_rows(anchors[len(POSITIVE_ANCHORS):]).mean(axis=0)
+            self._anchors = normalize_rows(np.stack([positive, negative]))
+
+        similarities = normalize_rows(embeddings) @ self._anchors.T
+        margin = similarities[:, 0] - similarities[:, 1]
+        # The anchors' own margin is the natural unit of "fully positive"
+        scale = float(self._anchors[0] @ self._anchors[0] - self._anchors[0] @ self._anchors[1]) or 1.0
+        return np.clip(margin / scale, -1.0, 1.0)
+
+
+# Create an engine instance shared by all services
+sentiment_engine = SentimentEngine()
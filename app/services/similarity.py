@@ -0,0 +1,131 @@
+# app/services/similarity.py
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .vector_index import normalize_rows
+
+FEATURE_MODES = ("pooled", "set")
+
+# Storage types for competitor matrices; float16 halves memory, scores are
+# always accumulated in float32
+STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+
+def cosine_similarity_matrix(a: np.ndarray, b: Optional[np.ndarray] = None) -> np.ndarray:
+    """Pairwise cosine similarity of the rows of a (and b) in one matrix product"""
+    a = normalize_rows(a)
+    b = a if b is None else normalize_rows(b)
+    return a @ b.T
+
+
+def pooled_similarity(embeddings: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Similarity of mean-pooled feature sets, one row of embeddings per feature
+
+    ``counts[i]`` consecutive rows of ``embeddings`` belong to competitor i.
+    """
+    offsets = _offsets(counts)
+    pooled = np.add.reduceat(normalize_rows(embeddings), offsets, axis=0) / counts[:, None]
+    return cosine_similarity_matrix(pooled)
+
+
+def set_match_similarity(
+        embeddings: np.ndarray,
+        counts: np.ndarray,
+        block_rows: int = 4096
+) -> np.ndarray:
+    """Symmetric mean-of-best-match similarity between feature sets
+
+    For competitors i and j this averages, over every feature of i, its best
+    cosine match among the features of j, then symmetrizes. Feature-by-feature
+    scores are computed block by block so memory stays at
+    ``block_rows x total_features``.
+    """
+    normalized = normalize_rows(embeddings)
+    offsets = _offsets(counts)
+    ends = offsets + counts
+    best_sums = np.empty((len(counts), len(counts)), dtype=np.float32)
+
+    # Blocks hold whole competitors so row sums stay within one block
+    start = 0
+    while start < len(counts):
+        stop = start + 1
+        while stop < len(counts) and ends[stop] - offsets[start] <= block_rows:
+            stop += 1
+        scores = normalized[offsets[start]:ends[stop - 1]] @ normalized.T
+        best = np.maximum.reduceat(scores, offsets, axis=1)
+        best_sums[start:stop] = np.add.reduceat(best, offsets[start:stop] - offsets[start], axis=0)
+        start = stop
+
+    directed = best_sums / counts[:, None]
+    return (directed + directed.T) / 2
+
+
+def feature_similarity(embeddings: np.ndarray, counts: np.ndarray, mode: str = "pooled") -> np.ndarray:
+    """Pairwise feature-set similarity matrix for the given mode"""
+    counts = np.asarray(counts)
+    if mode == "pooled":
+        return pooled_similarity(embeddings, counts)
+    if mode == "set":
+        return set_match_similarity(embeddings, counts)
+    raise ValueError(f"Unknown feature similarity mode: {mode}. Use one of {', '.join(FEATURE_MODES)}")
+
+
+def as_storage(vectors: np.ndarray, dtype: str = "float32", block_rows: int = 8192) -> np.ndarray:
+    """L2-normalized copy of vectors in a storage dtype, built block by block"""
+    vectors = np.atleast_2d(vectors)
+    stored = np.empty(vectors.shape, dtype=STORAGE_DTYPES[dtype])
+    for start in range(0, len(vectors), block_rows):
+        stored[start:start + block_rows] = normalize_rows(vectors[start:start + block_rows])
+    return stored
+
+
+def market_positions(
+        targets: np.ndarray,
+        competitors: np.ndarray,
+        block_rows: int = 4096
+) -> Dict[str, np.ndarray]:
+    """Average, max and min cosine similarity of every target to every competitor
+
+    ``competitors`` may be stored as float32 or float16 (see ``as_storage``);
+    it is normalized and upcast one block of rows at a time, so extra memory
+    stays at ``block_rows x (dimension + block_rows)`` whatever the matrix
+    size. The average uses the sum of normalized competitor rows, so only
+    max and min need the full target x competitor product.
+    """
+    competitors = np.atleast_2d(competitors)
+    if competitors.shape[0] == 0:
+        raise ValueError("At least one competitor embedding is required")
+    targets = normalize_rows(np.atleast_2d(targets))
+
+    total = np.zeros(targets.shape[1], dtype=np.float32)
+    maximum = np.full(len(targets), -np.inf, dtype=np.float32)
+    minimum = np.full(len(targets), np.inf, dtype=np.float32)
+    for start in range(0, len(competitors), block_rows):
+        block = normalize_rows(competitors[start:start + block_rows])
+        total += block.sum(axis=0)
+        for row in range(0, len(targets), block_rows):
+            scores = targets[row:row + block_rows] @ block.T
+            np.maximum(maximum[row:row + block_rows], scores.max(axis=1), out=maximum[row:row + block_rows])
+            np.minimum(minimum[row:row + block_rows], scores.min(axis=1), out=minimum[row:row + block_rows])
+
+    average = targets @ total / len(competitors)
+    return {
+        "average_similarity": average,
+        "max_similarity": maximum,
+        "min_similarity": minimum,
+        "uniqueness_score": 1 - average,
+    }
+
+
+def similarity_pairs(ids: List[str], matrix: np.ndarray) -> Dict[str, float]:
+    """Flatten the upper triangle of a similarity matrix into {"id1-id2": score}"""
+    rows, cols = np.triu_indices(len(ids), k=1)
+    return {
+        f"{ids[i]}-{ids[j]}": score
+        for i, j, score in zip(rows.tolist(), cols.tolist(), matrix[rows, cols].tolist())
+    }
+
+
+def _offsets(counts: np.ndarray) -> np.ndarray:
+    return np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(int)
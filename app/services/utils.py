@@ -1,7 +1,58 @@
 import numpy as np
+from collections import Counter
 from typing import List, Dict
 from datetime import datetime, timedelta
 
+from .similarity import market_positions
+
+# English function words plus review boilerplate that never distinguishes
+# one competitor from another
+STOPWORDS = frozenset("""
+a about above after again against all almost also although always am among an and
+another any anyone anything are aren't around as at be became because become been
+before being below between both but by can can't cannot could couldn't did didn't do
+does doesn't doing don't done down during each either else enough etc even ever every
+few for from further get gets getting give given go goes going got had hadn't has
+hasn't have haven't having he he'd he'll he's her here here's hers herself him himself
+his how how's however i i'd i'll i'm i've if in into is isn't it it's its itself just
+least less let let's like likely made make makes many may maybe me might more most
+much must mustn't my myself near need needs neither never new no nor not now of off
+often on once one only onto or other others otherwise ought our ours ourselves out
+over own per perhaps please quite rather really said same say says see seem seems
+shan't she she'd she'll she's should shouldn't since so some something still such
+take than that that's the their theirs them themselves then there there's these they
+they'd they'll they're they've thing things this those though through thus to too
+toward towards under until up upon us use used uses using very via want was wasn't
+way we we'd we'll we're we've well went were weren't what what's whatever when when's
+where where's whether which while who who's whom whose why why's will with within
+without won't would wouldn't yet you you'd you'll you're you've your yours yourself
+yourselves
+""".split())
+
+# Lowercase ASCII letters, digits and apostrophes survive; everything else splits
+_KEYWORD_TABLE = {
+    code: " " for code in range(128)
+    if not ("a" <= chr(code) <= "z" or "0" <= chr(code) <= "9" or chr(code) == "'")
+}
+_KEYWORD_TABLE.update({ord("\u2019"): "'", ord("\u2018"): "'"})
+_KEYWORD_TABLE.update({ord(char): " " for char in "\u201c\u201d\u2013\u2014\u2026\u00a0"})
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms of a text with stopwords, numbers and 1-letter tokens dropped"""
+    return [
+        token for token in (t.strip("'") for t in text.lower().translate(_KEYWORD_TABLE).split())
+        if len(token) > 1 and token not in STOPWORDS and not token.isdigit()
+    ]
+
+
+def build_competitor_text(competitor: Dict) -> str:
+    """Text used to embed a competitor, falling back to name, price and strengths"""
+    description = competitor.get('description', '')
+    if description:
+        return description
+    return f"{competitor['name']} - {competitor.get('price_range', '')} - {', '.join(competitor.get('strengths', []))}"
+
 
 def generate_time_series_data(days: int = 30) -> List[Dict]:
     """Generate dummy time series data for testing"""
@@ -27,15 +78,8 @@ def calculate_trend_strength(values: List[float]) -> float:
 
 def extract_keywords(text: str, top_n: int = 5) -> List[str]:
     """Extract key terms from text"""
-    # In a real application, you'd want to use proper NLP here
-    words = text.lower().split()
-    # Remove common words
-    stopwords = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to'}
-    words = [w for w in words if w not in stopwords]
-
-    # Count frequencies
-    from collections import Counter
-    counts = Counter(words)
+    # For keywords across a corpus of documents, use services.keywords
+    counts = Counter(tokenize(text))
 
     # Return top N words
     return [word for word, _ in counts.most_common(top_n)]
@@ -46,15 +90,8 @@ def calculate_market_position(
         competitor_embeddings: List[np.ndarray]
 ) -> Dict:
     """Calculate market position relative to competitors"""
-    similarities = [
-        float(np.dot(target_embedding, comp_emb) /
-              (np.linalg.norm(target_embedding) * np.linalg.norm(comp_emb)))
-        for comp_emb in competitor_embeddings
-    ]
-
-    return {
-        'average_similarity': float(np.mean(similarities)),
-        'max_similarity': float(np.max(similarities)),
-        'min_similarity': float(np.min(similarities)),
-        'uniqueness_score': float(1 - np.mean(similarities))
-    }
\ No newline at end of file
+    # For many targets at once, call similarity.market_positions directly
+    positions = market_positions(
+        np.asarray(target_embedding)[None, :], np.asarray(competitor_embeddings)
+    )
+    return {key: float(values[0]) for key, values in positions.items()}
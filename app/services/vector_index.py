@@ -0,0 +1,422 @@
+# app/services/vector_index.py
+import json
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+from .quantization import code_dtype, dequantize, normalize_rows, quantize, score_codes
+
+# IVF (re)training runs here, off the event loop; numpy releases the GIL
+# in the matrix products, so searches keep being served meanwhile
+_trainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ivf-train")
+
+
+def top_k(scores: np.ndarray, k: int, threshold: Optional[float] = None) -> np.ndarray:
+    """Indices of the k highest scores above threshold, best first, in O(n)"""
+    if k <= 0 or scores.size == 0:
+        return np.zeros(0, dtype=int)
+    if k < scores.size:
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(scores.size)
+    candidates = candidates[np.argsort(scores[candidates])[::-1]]
+    if threshold is not None:
+        candidates = candidates[scores[candidates] > threshold]
+    return candidates
+
+
+class VectorIndex(ABC):
+    """Id-addressed store of normalized vectors with top-k cosine search
+
+    Rows live in a preallocated array that grows geometrically; removal swaps
+    the last row into the hole, so add and remove are O(dimension). The sum of
+    all rows is kept up to date so the mean similarity of a vector to the
+    whole index is a single dot product.
+
+    Rows are stored in ``storage`` form ("float32", "float16" or "int8" with
+    a per-row scale, see ``quantization``) and searches score the codes
+    directly; ``vectors`` and ``vector`` return dequantized float32.
+    """
+
+    backend = ""
+
+    def __init__(self, dimension: Optional[int] = None, storage: Optional[str] = None):
+        self.dimension = dimension
+        self.storage = storage or settings.VECTOR_INDEX_STORAGE
+        code_dtype(self.storage)
+        self.ids: List[str] = []
+        self.row_of: Dict[str, int] = {}
+        # Codes and per-row scales (all ones unless int8)
+        self._vectors: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._sum: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self.row_of
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Populated rows as float32: a view for float32 storage, otherwise a dequantized copy"""
+        if self._vectors is None:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return self._rows(slice(0, len(self)))
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the stored rows, allocated capacity included"""
+        return 0 if self._vectors is None else self._vectors.nbytes + self._scales.nbytes
+
+    @property
+    def vector_sum(self) -> np.ndarray:
+        return self._sum if self._sum is not None else np.zeros(self.dimension or 0, dtype=np.float32)
+
+    def vector(self, item_id: str) -> Optional[np.ndarray]:
+        row = self.row_of.get(item_id)
+        return None if row is None else self._rows(row)
+
+    def as_stored(self, vectors: np.ndarray) -> np.ndarray:
+        """What ``vector`` would return for these vectors once added"""
+        return dequantize(*quantize(vectors, self.storage))
+
+    def add(self, ids: List[str], vectors: np.ndarray):
+        """Insert or replace vectors; they are normalized and quantized on the way in"""
+        codes, scales = quantize(vectors, self.storage)
+        for item_id, code, scale in zip(ids, codes, scales):
+            row = self.row_of.get(item_id)
+            if row is None:
+                row = len(self)
+                self._reserve(row + 1, code.shape[0])
+                self.ids.append(item_id)
+                self.row_of[item_id] = row
+            else:
+                self._sum -= self._rows(row)
+            self._vectors[row] = code
+            self._scales[row] = scale
+            self._sum += self._rows(row)
+            self._on_set(row)
+
+    def remove(self, ids: List[str]):
+        for item_id in ids:
+            row = self.row_of.pop(item_id, None)
+            if row is None:
+                continue
+            self._sum -= self._rows(row)
+            last = len(self) - 1
+            if row != last:
+                self._vectors[row] = self._vectors[last]
+                self._scales[row] = self._scales[last]
+                self.ids[row] = self.ids[last]
+                self.row_of[self.ids[row]] = row
+                self._on_move(last, row)
+            self.ids.pop()
+
+    @abstractmethod
+    def search(
+            self,
+            query: np.ndarray,
+            k: int,
+            threshold: Optional[float] = None,
+            exclude: Optional[str] = None
+    ) -> List[Tuple[str, float]]:
+        """Return up to k (id, cosine similarity) pairs, best first"""
+
+    def save(self, path: str):
+        """Write the index to a single .npz file"""
+        arrays = self._state()
+        np.savez(
+            path,
+            ids=np.array(self.ids, dtype=str),
+            vectors=self.vectors,
+            codes=self._vectors[:len(self)] if self._vectors is not None else np.zeros(0),
+            scales=self._scales[:len(self)] if self._scales is not None else np.zeros(0),
+            meta=np.array(json.dumps({"backend": self.backend, **self._params()})),
+            **arrays
+        )
+
+    @staticmethod
+    def load(path: str) -> "VectorIndex":
+        """Read an index written by save, whatever its backend"""
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            index = create_index(meta.pop("backend"), **meta)
+            vectors = data["vectors"]
+            index.dimension = vectors.shape[1] if vectors.ndim == 2 else index.dimension
+            ids = [str(item_id) for item_id in data["ids"]]
+            index._restore(ids, vectors, data)
+        return index
+
+    def _restore(self, ids: List[str], vectors: np.ndarray, data):
+        self.ids = []
+        self.row_of = {}
+        self._vectors = None
+        self._scales = None
+        self._sum = None
+        if not ids:
+            return
+        if "codes" in data.files and data["codes"].dtype == code_dtype(self.storage):
+            # Same storage: take the codes as saved instead of quantizing twice
+            self._reserve(len(ids), vectors.shape[1])
+            self.ids = list(ids)
+            self.row_of = {item_id: row for row, item_id in enumerate(ids)}
+            self._vectors[:len(ids)] = data["codes"]
+            self._scales[:len(ids)] = data["scales"]
+            self._sum = self.vectors.sum(axis=0)
+        else:
+            self.add(ids, vectors)
+
+    def _params(self) -> Dict:
+        return {"dimension": self.dimension, "storage": self.storage}
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def _on_set(self, row: int):
+        pass
+
+    def _on_move(self, source: int, target: int):
+        pass
+
+    def _rows(self, rows) -> np.ndarray:
+        """Dequantized float32 of a row, slice or array of rows"""
+        if self._vectors.dtype == np.float32:
+            return self._vectors[rows]
+        return self._vectors[rows].astype(np.float32) * self._scales[rows, None]
+
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine scores of a normalized query against all (or the given) rows"""
+        if rows is None:
+            return score_codes(self._vectors[:len(self)], self._scales[:len(self)], query)
+        return score_codes(self._vectors[rows], self._scales[rows], query)
+
+    def _reserve(self, rows: int, dimension: int):
+        self.dimension = dimension
+        dtype = code_dtype(self.storage)
+        if self._vectors is None:
+            self._vectors = np.zeros((max(rows, 64), dimension), dtype=dtype)
+            self._scales = np.ones(self._vectors.shape[0], dtype=np.float32)
+            self._sum = np.zeros(dimension, dtype=np.float32)
+        elif rows > self._vectors.shape[0]:
+            grown = np.zeros((max(rows, 2 * self._vectors.shape[0]), dimension), dtype=dtype)
+            grown[:len(self)] = self._vectors[:len(self)]
+            self._vectors = grown
+            scales = np.ones(grown.shape[0], dtype=np.float32)
+            scales[:len(self)] = self._scales[:len(self)]
+            self._scales = scales
+            self._grow(grown.shape[0])
+
+    def _grow(self, capacity: int):
+        pass
+
+    def _results(
+            self,
+            rows: np.ndarray,
+            scores: np.ndarray,
+            k: int,
+            threshold: Optional[float],
+            exclude: Optional[str]
+    ) -> List[Tuple[str, float]]:
+        excluded_row = self.row_of.get(exclude) if exclude is not None else None
+        if excluded_row is not None:
+            keep = rows != excluded_row
+            rows, scores = rows[keep], scores[keep]
+        best = top_k(scores, k, threshold)
+        return [(self.ids[rows[i]], float(scores[i])) for i in best]
+
+
+class ExactIndex(VectorIndex):
+    """Brute-force search: one matrix-vector product over every row"""
+
+    backend = "exact"
+
+    def search(self, query, k, threshold=None, exclude=None):
+        if not len(self):
+            return []
+        query = normalize_rows(query)
+        scores = self._scores(query)
+        return self._results(np.arange(len(self)), scores, k, threshold, exclude)
+
+
+class IVFIndex(VectorIndex):
+    """Inverted-file index: k-means cells, only the nprobe closest are scanned
+
+    Below ``min_train_size`` rows the index searches exhaustively. Once
+    trained, new rows are assigned to their nearest centroid, and the
+    centroids are retrained when the index has grown ``retrain_factor``-fold
+    since the last training. Automatic (re)training runs on a snapshot in a
+    background thread; until it finishes, searches use exact scan (first
+    training) or the previous centroids (retraining).
+    """
+
+    backend = "ivf"
+
+    def __init__(
+            self,
+            dimension: Optional[int] = None,
+            storage: Optional[str] = None,
+            nlist: Optional[int] = None,
+            nprobe: Optional[int] = None,
+            min_train_size: int = 1024,
+            retrain_factor: float = 4.0,
+            seed: int = 0
+    ):
+        super().__init__(dimension, storage)
+        self.nlist = nlist
+        self.nprobe = nprobe or settings.VECTOR_INDEX_NPROBE
+        self.min_train_size = min_train_size
+        self.retrain_factor = retrain_factor
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._trained_size = 0
+        self._training: Optional[Future] = None
+        self._training_ids: List[str] = []
+        # Ids written while a background training was running
+        self._changed: set = set()
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, iterations: int = 10, sample_size: int = 50000):
+        """Fit the coarse quantizer with spherical k-means and reassign rows, blocking"""
+        if not len(self):
+            return
+        centroids, assignments = self._fit(self.vectors, iterations, sample_size)
+        self.centroids = centroids
+        self._assignments[:len(self)] = assignments
+        self._trained_size = len(self)
+
+    def _fit(self, vectors: np.ndarray, iterations: int = 10, sample_size: int = 50000):
+        """Centroids for ``vectors`` and the cell of each row; touches no index state"""
+        rng = np.random.default_rng(self.seed)
+        nlist = self.nlist or max(1, int(np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+
+        sample = vectors
+        if len(vectors) > sample_size:
+            sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=nlist) == 0
+            # Reseed empty cells with random points so no cell goes dead
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = normalize_rows(sums)
+        return centroids, np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    def _train_in_background(self):
+        if self._training is not None:
+            return
+        self._training_ids = list(self.ids)
+        self._changed = set()
+        self._training = _trainer.submit(self._fit, self.vectors.copy())
+
+    def _finish_training(self):
+        """Adopt a finished background training; rows written meanwhile are reassigned"""
+        if self._training is None or not self._training.done():
+            return
+        training, self._training = self._training, None
+        try:
+            centroids, assignments = training.result()
+        except Exception as e:
+            logging.error(f"IVF index training failed: {str(e)}")
+            return
+        trained_cell = dict(zip(self._training_ids, assignments.tolist()))
+        cells = np.array([
+            -1 if item_id in self._changed else trained_cell.get(item_id, -1)
+            for item_id in self.ids
+        ], dtype=np.int32)
+        self.centroids = centroids
+        stale = np.flatnonzero(cells < 0)
+        if stale.size:
+            cells[stale] = self._assign(self._rows(stale))
+        self._assignments[:len(self)] = cells
+        self._trained_size = len(self._training_ids)
+        self._training_ids = []
+        self._changed = set()
+
+    def search(self, query, k, threshold=None, exclude=None):
+        if not len(self):
+            return []
+        query = normalize_rows(query)
+        self._finish_training()
+        if not self.trained:
+            if len(self) >= self.min_train_size:
+                self._train_in_background()
+            scores = self._scores(query)
+            return self._results(np.arange(len(self)), scores, k, threshold, exclude)
+
+        probe = top_k(self.centroids @ query, self.nprobe)
+        rows = np.flatnonzero(np.isin(self._assignments[:len(self)], probe))
+        scores = self._scores(query, rows)
+        return self._results(rows, scores, k, threshold, exclude)
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def _on_set(self, row: int):
+        self._finish_training()
+        if self._training is not None:
+            self._changed.add(self.ids[row])
+        if not self.trained:
+            return
+        if len(self) > self.retrain_factor * self._trained_size:
+            self._train_in_background()
+        self._assignments[row] = self._assign(self._rows(slice(row, row + 1)))[0]
+
+    def _on_move(self, source: int, target: int):
+        self._assignments[target] = self._assignments[source]
+
+    def _grow(self, capacity: int):
+        grown = np.zeros(capacity, dtype=np.int32)
+        grown[:len(self._assignments)] = self._assignments
+        self._assignments = grown
+
+    def _reserve(self, rows: int, dimension: int):
+        first = self._vectors is None
+        super()._reserve(rows, dimension)
+        if first:
+            self._grow(self._vectors.shape[0])
+
+    def _params(self) -> Dict:
+        return {
+            "dimension": self.dimension,
+            "storage": self.storage,
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "min_train_size": self.min_train_size,
+            "retrain_factor": self.retrain_factor,
+            "seed": self.seed,
+        }
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        if not self.trained:
+            return {}
+        return {"centroids": self.centroids}
+
+    def _restore(self, ids, vectors, data):
+        super()._restore(ids, vectors, data)
+        if "centroids" in data.files:
+            self.centroids = data["centroids"]
+            self._assignments[:len(self)] = self._assign(self.vectors)
+            self._trained_size = len(self)
+
+
+def create_index(backend: Optional[str] = None, **params) -> VectorIndex:
+    """Build an empty index for the configured (or given) backend"""
+    backend = backend or settings.VECTOR_INDEX_BACKEND
+    if backend == ExactIndex.backend:
+        return ExactIndex(dimension=params.get("dimension"), storage=params.get("storage"))
+    if backend == IVFIndex.backend:
+        return IVFIndex(**params)
+    raise ValueError(f"Unknown vector index backend: {backend}")
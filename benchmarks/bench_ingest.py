@@ -0,0 +1,79 @@
+# benchmarks/bench_ingest.py
+"""Bulk competitor ingest throughput in rows per second
+
+Runs CompetitorService.bulk_write_competitors against the MongoDB at
+MONGODB_URL, in a scratch database that is dropped afterwards.
+
+Usage: python -m benchmarks.bench_ingest [--rows 20000] [--upsert]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+from app.services.competitor_service import CompetitorService
+
+
+def synthetic_rows(count: int, seed: int = 0):
+    for i in range(count):
+        yield {
+            "name": f"Vendor {seed}-{i}",
+            "website": f"https://vendor-{seed}-{i}.example.com",
+            "market_share": (i % 1000) / 10,
+            "price_range": ["$", "$$", "$$$"][i % 3],
+            "customer_count": f"{(i % 50) * 100}+",
+            "strengths": [f"strength {i % 17}", f"strength {i % 23}"],
+            "weaknesses": [f"weakness {i % 11}"],
+            "description": f"Vendor {i} builds tools for segment {i % 40} with focus {i % 7}",
+        }
+
+
+async def as_async(rows):
+    for row in rows:
+        yield row
+
+
+async def run(args):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    database = client[args.database]
+    service = CompetitorService(database)
+    await service.ensure_indexes()
+
+    try:
+        started = time.perf_counter()
+        summary = await service.bulk_write_competitors(as_async(synthetic_rows(args.rows)))
+        insert_seconds = time.perf_counter() - started
+        report = {
+            "rows": args.rows,
+            "chunk_size": settings.BULK_INGEST_CHUNK_SIZE,
+            "insert_rows_per_second": args.rows / insert_seconds,
+            "created": summary["created"],
+            "failed": summary["failed"],
+        }
+
+        if args.upsert:
+            started = time.perf_counter()
+            summary = await service.bulk_write_competitors(
+                as_async(synthetic_rows(args.rows)), upsert=True
+            )
+            report["upsert_rows_per_second"] = args.rows / (time.perf_counter() - started)
+            report["upsert_updated"] = summary["updated"]
+        print(json.dumps(report, indent=2))
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--upsert", action="store_true", help="Also time a full upsert pass")
+    parser.add_argument("--database", default=f"{settings.DATABASE_NAME}_bench_ingest")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
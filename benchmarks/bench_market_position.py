@@ -0,0 +1,66 @@
+# benchmarks/bench_market_position.py
+"""Batched market positioning versus the per-competitor loop, 10 to 100k competitors
+
+Usage: python -m benchmarks.bench_market_position [--targets 100] [--sizes 10 100 1000 10000 100000]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.services.similarity import as_storage, market_positions
+from benchmarks.bench_vector_index import synthetic_embeddings
+
+
+def loop_position(target: np.ndarray, competitors: np.ndarray) -> float:
+    """The original list-comprehension implementation, for comparison"""
+    similarities = [
+        float(np.dot(target, comp) / (np.linalg.norm(target) * np.linalg.norm(comp)))
+        for comp in competitors
+    ]
+    return float(np.mean(similarities))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--targets", type=int, default=100)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--loop-max-size", type=int, default=10000,
+                        help="Skip the per-competitor loop above this size")
+    args = parser.parse_args()
+
+    targets = synthetic_embeddings(args.targets, args.dimension, clusters=8, seed=1)
+    report = {"targets": args.targets, "dimension": args.dimension, "results": []}
+    for size in args.sizes:
+        competitors = synthetic_embeddings(size, args.dimension, clusters=max(8, size // 500))
+        row = {"competitors": size}
+        reference = None
+        for dtype in ("float32", "float16"):
+            stored = as_storage(competitors, dtype)
+            started = time.perf_counter()
+            positions = market_positions(targets, stored)
+            row[f"{dtype}_ms"] = (time.perf_counter() - started) * 1000
+            row[f"{dtype}_matrix_mb"] = stored.nbytes / 2 ** 20
+            if reference is None:
+                reference = positions
+            else:
+                row["float16_max_abs_error"] = float(max(
+                    np.abs(positions[key] - reference[key]).max() for key in reference
+                ))
+
+        if size <= args.loop_max_size:
+            # One target is enough to measure the loop; scale to all targets
+            started = time.perf_counter()
+            average = loop_position(targets[0], competitors)
+            row["loop_ms_estimate"] = (time.perf_counter() - started) * 1000 * args.targets
+            row["loop_matches"] = bool(np.isclose(average, reference["average_similarity"][0], atol=1e-4))
+            row["speedup_vs_loop"] = row["loop_ms_estimate"] / row["float32_ms"]
+        report["results"].append(row)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_segmentation.py
+"""Market segmentation fit, incremental add and describe, 1k to 100k competitors
+
+Peak memory (tracemalloc) should grow linearly with the number of
+competitors; the dense N x N similarity matrix clients used to cluster is
+reported alongside for comparison.
+
+Usage: python -m benchmarks.bench_segmentation [--segments 8] [--sizes 1000 10000 100000]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.services.segmentation import MarketSegmentation, assign_segments
+from app.services.vector_index import normalize_rows
+from benchmarks.bench_vector_index import synthetic_embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--segments", type=int, default=8)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--adds", type=int, default=1000, help="Competitors added one by one after the fit")
+    args = parser.parse_args()
+
+    report = {"segments": args.segments, "dimension": args.dimension, "results": []}
+    for size in args.sizes:
+        # The embedding matrix stores normalized rows
+        vectors = normalize_rows(synthetic_embeddings(size + args.adds, args.dimension, clusters=args.segments))
+        ids = [str(i) for i in range(len(vectors))]
+        fitted_ids, fitted = ids[:size], vectors[:size]
+        names = {competitor_id: f"competitor {competitor_id}" for competitor_id in ids}
+        segmentation = MarketSegmentation(args.segments, refit_fraction=1.0)
+        row = {"competitors": size}
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        segmentation.fit(fitted_ids, fitted)
+        row["fit_ms"] = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        described = segmentation.describe(fitted_ids, fitted, names)
+        row["describe_ms"] = (time.perf_counter() - started) * 1000
+        row["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+        row["peak_bytes_per_competitor"] = row["peak_mb"] * 2 ** 20 / size
+        row["dense_similarity_mb"] = size * size * 4 / 2 ** 20
+        row["mean_centroid_similarity"] = float(np.mean(assign_segments(fitted, segmentation.centroids)[1]))
+        row["largest_segment"] = max(segment["size"] for segment in described["segments"])
+
+        started = time.perf_counter()
+        for start in range(size, len(ids)):
+            segmentation.add(ids[start:start + 1], vectors[start:start + 1])
+        row["add_us_per_competitor"] = (time.perf_counter() - started) * 1e6 / args.adds
+        # Agreement of incremental assignments with a full refit
+        incremental = np.array([segmentation.labels[competitor_id] for competitor_id in ids[size:]])
+        refit = assign_segments(vectors[size:], segmentation.centroids)[0]
+        row["incremental_matches_nearest"] = float(np.mean(incremental == refit))
+        report["results"].append(row)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
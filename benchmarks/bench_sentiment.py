@@ -0,0 +1,56 @@
+# benchmarks/bench_sentiment.py
+"""Throughput of batched lexicon sentiment scoring
+
+Usage: python -m benchmarks.bench_sentiment [--mentions 100000] [--words 20]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.services.sentiment import DEFAULT_LEXICON, NEGATIONS, SentimentEngine
+
+FILLER = [
+    "the", "product", "support", "team", "pricing", "dashboard", "we", "it", "is", "was",
+    "and", "but", "with", "for", "our", "their", "update", "release", "customers", "today",
+]
+
+
+def synthetic_mentions(count: int, words: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(FILLER * 4 + list(DEFAULT_LEXICON) + sorted(NEGATIONS))
+    tokens = rng.choice(vocabulary, size=(count, words))
+    return [" ".join(row) + "." for row in tokens]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mentions", type=int, default=100000)
+    parser.add_argument("--words", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    mentions = synthetic_mentions(args.mentions, args.words)
+    engine = SentimentEngine()
+    engine.score_texts(mentions[:100])
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        scores = engine.score_texts(mentions)
+        timings.append(time.perf_counter() - started)
+
+    best = min(timings)
+    print(json.dumps({
+        "mentions": args.mentions,
+        "words_per_mention": args.words,
+        "best_seconds": best,
+        "median_seconds": float(np.median(timings)),
+        "mentions_per_second": args.mentions / best,
+        "mean_score": float(scores.mean()),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/bench_serialization.py
+"""Response serialization cost: response-model path versus FastJSONResponse
+
+For each size this renders a market-analysis result (an n x n similarity
+matrix) and a page of competitor listings the way FastAPI does with a
+response_model (validate, jsonable_encoder, json.dumps) and through
+FastJSONResponse, with the matrix as nested JSON and as base64 float32.
+
+Usage: python -m benchmarks.bench_serialization [--sizes 100 1000 2000] [--repeat 3]
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.models.schemas import Analysis, CompetitorProjection
+from app.responses import FastJSONResponse, encode_matrix, orjson
+from benchmarks.bench_vector_index import synthetic_embeddings
+
+
+def analysis_result(size: int) -> Dict:
+    embeddings = synthetic_embeddings(size, 384, clusters=max(8, size // 100))
+    return {
+        "analysis_date": datetime.utcnow(),
+        "market_positions": {
+            f"competitor {i}": {"uniqueness_score": 0.5, "similar_competitors": []}
+            for i in range(size)
+        },
+        "share_trends": {"trends": {"growing": 0, "declining": 0, "stable": size}},
+        "similarity_scores": embeddings @ embeddings.T,
+    }
+
+
+def competitor_page(size: int) -> List[Dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "id": str(ObjectId()),
+            "name": f"competitor {i}",
+            "website": f"https://competitor{i}.example",
+            "market_share": 1.5,
+            "price_range": "$$",
+            "customer_count": "1000+",
+            "strengths": ["fast onboarding", "integrations"],
+            "weaknesses": ["pricing"],
+            "description": "Analytics platform for mid-market retail teams",
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(size)
+    ]
+
+
+def response_model_analysis(result: Dict) -> bytes:
+    """What the route did before: a list copy, validation, then encoding"""
+    content = {**result, "similarity_scores": result["similarity_scores"].tolist()}
+    return JSONResponse(jsonable_encoder(Analysis(**content))).body
+
+
+def response_model_listing(page: List[Dict]) -> bytes:
+    return JSONResponse(jsonable_encoder(
+        [CompetitorProjection(**doc) for doc in page], exclude_unset=True
+    )).body
+
+
+def fast_analysis(result: Dict, encoding: str) -> bytes:
+    content = {**result, "similarity_scores": encode_matrix(result["similarity_scores"], encoding)}
+    return FastJSONResponse(content).body
+
+
+def best_of(repeat: int, render: Callable[[], bytes]) -> Dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = render()
+        timings.append(time.perf_counter() - started)
+    return {"ms": min(timings) * 1000, "kb": len(body) / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 2000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    report = {"orjson": orjson is not None, "results": []}
+    for size in args.sizes:
+        result = analysis_result(size)
+        page = competitor_page(size)
+        row = {"competitors": size, "analysis": {}, "listing": {}}
+        row["analysis"]["response_model"] = best_of(args.repeat, lambda: response_model_analysis(result))
+        for encoding in ("json", "base64"):
+            row["analysis"][f"fast_{encoding}"] = best_of(args.repeat, lambda: fast_analysis(result, encoding))
+        row["analysis"]["speedup_json"] = row["analysis"]["response_model"]["ms"] / row["analysis"]["fast_json"]["ms"]
+        row["listing"]["response_model"] = best_of(args.repeat, lambda: response_model_listing(page))
+        row["listing"]["fast_json"] = best_of(args.repeat, lambda: FastJSONResponse(page).body)
+        row["listing"]["speedup"] = row["listing"]["response_model"]["ms"] / row["listing"]["fast_json"]["ms"]
+        report["results"].append(row)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
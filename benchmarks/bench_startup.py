@@ -0,0 +1,84 @@
+# benchmarks/bench_startup.py
+"""Import time of app.main and time until the first /api/health response
+
+Usage: python -m benchmarks.bench_startup [--runs 5] [--port 8765]
+
+The health check needs the MongoDB at MONGODB_URL; models are not needed
+since they load in the background (or lazily with EMBEDDING_PRELOAD=false).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "sklearn", "transformers")
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def measure_import() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_first_health(port: int, timeout: float = 120) -> float:
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, "PYTHONUNBUFFERED": "1"}
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited before serving /api/health")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"/api/health did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--skip-health", action="store_true")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    import_seconds = [run["seconds"] for run in imports]
+    report = {
+        "runs": args.runs,
+        "import_seconds_median": statistics.median(import_seconds),
+        "import_seconds_max": max(import_seconds),
+        "heavy_modules_imported": imports[-1]["heavy"],
+    }
+    if not args.skip_health:
+        health_seconds = [measure_first_health(args.port) for _ in range(args.runs)]
+        report["first_health_seconds_median"] = statistics.median(health_seconds)
+        report["first_health_seconds_max"] = max(health_seconds)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
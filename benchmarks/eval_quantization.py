@@ -0,0 +1,111 @@
+# benchmarks/eval_quantization.py
+"""Accuracy loss and footprint of quantized embedding storage versus float32
+
+Scores come from the paths the app uses: nearest-competitor search on an
+``ExactIndex`` holding the codes (``VECTOR_INDEX_STORAGE``), and the
+pairwise matrix of a market analysis (``QuantizedMatrix.pairwise``).
+
+Usage: python -m benchmarks.eval_quantization [--size 50000] [--queries 200] [--pairwise 2000] [--model all-MiniLM-L6-v2]
+
+Without --model the vectors are synthetic clustered embeddings; with it,
+texts generated from a small vocabulary are encoded by the model so the
+value distribution matches real embeddings.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.services.quantization import SCHEMES, QuantizedMatrix, pack, unpack
+from app.services.vector_index import ExactIndex, normalize_rows, top_k
+from benchmarks.bench_vector_index import synthetic_embeddings
+
+WORDS = [
+    "fast", "cheap", "secure", "cloud", "analytics", "support", "mobile", "enterprise",
+    "startup", "dashboard", "integration", "pricing", "reliable", "platform", "api", "crm",
+]
+
+
+def model_embeddings(model_name: str, size: int, seed: int = 0) -> np.ndarray:
+    from sentence_transformers import SentenceTransformer
+
+    rng = np.random.default_rng(seed)
+    texts = [" ".join(rng.choice(WORDS, 6)) for _ in range(size)]
+    return SentenceTransformer(model_name).encode(texts, batch_size=256).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pairwise", type=int, default=2000, help="Competitors in the market-analysis matrix")
+    parser.add_argument("--model", default=None)
+    args = parser.parse_args()
+
+    if args.model:
+        vectors = model_embeddings(args.model, args.size)
+    else:
+        vectors = synthetic_embeddings(args.size, args.dimension, clusters=max(8, args.size // 500))
+    queries = vectors[np.random.default_rng(1).choice(len(vectors), args.queries, replace=False)]
+
+    reference = normalize_rows(vectors)
+    queries = normalize_rows(queries)
+    exact_scores = queries @ reference.T
+    exact_top = [set(top_k(row, args.k).tolist()) for row in exact_scores]
+    analysed = reference[:args.pairwise]
+    exact_pairwise = analysed @ analysed.T
+    ids = [str(i) for i in range(len(vectors))]
+
+    report = {
+        "size": len(vectors), "dimension": vectors.shape[1], "k": args.k,
+        "pairwise_size": len(analysed), "schemes": [],
+    }
+    for scheme in SCHEMES:
+        index = ExactIndex(storage=scheme)
+        index.add(ids, vectors)
+        # Scores of every row, as the index computes them from its codes
+        scores = np.stack([index._scores(query) for query in queries])
+        errors = np.abs(scores - exact_scores)
+        started = time.perf_counter()
+        found = [index.search(query, args.k) for query in queries]
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        recall = np.mean([
+            len({int(item_id) for item_id, _ in matches} & truth) / args.k
+            for matches, truth in zip(found, exact_top)
+        ])
+
+        started = time.perf_counter()
+        pairwise = QuantizedMatrix.from_vectors(analysed, scheme).pairwise()
+        pairwise_ms = (time.perf_counter() - started) * 1000
+        pairwise_errors = np.abs(pairwise - exact_pairwise)
+
+        started = time.perf_counter()
+        payloads = [pack(vector, scheme) for vector in vectors[:1000]]
+        restored = np.stack([unpack(payload, scheme) for payload in payloads])
+        roundtrip_us = (time.perf_counter() - started) / len(payloads) * 1e6
+
+        report["schemes"].append({
+            "scheme": scheme,
+            "bytes_per_vector": len(payloads[0]),
+            "index_mb": index.nbytes / 2 ** 20,
+            "similarity_mean_abs_error": float(errors.mean()),
+            "similarity_max_abs_error": float(errors.max()),
+            f"recall_at_{args.k}": float(recall),
+            "search_batch_ms": elapsed_ms,
+            "pairwise_mean_abs_error": float(pairwise_errors.mean()),
+            "pairwise_max_abs_error": float(pairwise_errors.max()),
+            "pairwise_ms": pairwise_ms,
+            "pack_roundtrip_max_error": float(np.abs(restored - reference[:1000]).max()),
+            "pack_roundtrip_us_per_vector": roundtrip_us,
+        })
+
+    # BSON float arrays cost 9 bytes per element (type tag, key and double)
+    report["bson_float_array_bytes_per_vector"] = vectors.shape[1] * 9
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
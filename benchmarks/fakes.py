@@ -0,0 +1,85 @@
+# benchmarks/fakes.py
+"""Stand-ins that let the app run without MongoDB or a model download
+
+``StubEmbeddingModel`` is a deterministic feature-hashing encoder with the
+SentenceTransformer methods the app calls. ``use_in_memory_database``
+points ``app.database.db`` at a mongomock_motor client (pip install
+mongomock-motor). mongomock scans collections linearly, so absolute numbers
+reflect the fake; compare runs against each other, or use a real server.
+Aggregation stages mongomock lacks ($dateTrunc, $merge) fail inside the
+affected routes and show up as errors in the report.
+"""
+import zlib
+from typing import List
+
+import numpy as np
+
+from app.config import settings
+from app.database import db
+from app.services.model_registry import model_registry
+
+
+class StubEmbeddingModel:
+    """Bag-of-words hashed into a fixed-size unit vector; same text, same vector"""
+
+    def __init__(self, dimension: int = 384, seed: int = 0):
+        self.dimension = dimension
+        self.seed = seed
+        self._token_cache = {}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts: List[str], batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                vectors[row] += self._token_vector(token)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        vector = self._token_cache.get(token)
+        if vector is None:
+            rng = np.random.default_rng(zlib.crc32(token.encode("utf-8")) + self.seed)
+            vector = rng.standard_normal(self.dimension).astype(np.float32)
+            self._token_cache[token] = vector
+        return vector
+
+
+def install_stub_model(dimension: int = 384):
+    """Register the stub under every configured model name"""
+    for name in {settings.EMBEDDING_MODEL, *settings.EMBEDDING_MODELS}:
+        model_registry._models[name] = StubEmbeddingModel(dimension)
+        model_registry._stats[name] = {"stub": True}
+
+
+def use_in_memory_database(database_name: str = "benchmark"):
+    """Serve app.database.db from an in-process mongomock_motor client"""
+    from mongomock_motor import AsyncMongoMockClient
+    import mongomock.collection
+
+    # Recent pymongo passes sort= to update operations; mongomock predates it
+    add_update = mongomock.collection.BulkOperationBuilder.add_update
+    if not getattr(add_update, "accepts_sort", False):
+        def add_update_without_sort(self, *args, sort=None, **kwargs):
+            return add_update(self, *args, **kwargs)
+        add_update_without_sort.accepts_sort = True
+        mongomock.collection.BulkOperationBuilder.add_update = add_update_without_sort
+
+    # Unique indexes are checked by scanning the whole collection on every
+    # insert, which would dominate all timings at 100k documents
+    mongomock.collection.Collection._ensure_uniques = lambda self, new_data: None
+
+    client = AsyncMongoMockClient()
+
+    async def connect_to_database():
+        db.client = client
+        db.db = client[database_name]
+
+    async def close_database_connection():
+        pass
+
+    db.connect_to_database = connect_to_database
+    db.close_database_connection = close_database_connection
+    return client
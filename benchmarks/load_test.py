@@ -0,0 +1,343 @@
+# benchmarks/load_test.py
+"""Throughput and latency percentiles for every /api/competitors and /api/analysis route
+
+Seeds synthetic competitors, mentions and market-share history at each
+scale, then drives the app in process through httpx's ASGI transport.
+By default MongoDB is an in-memory fake and the embedding model a
+deterministic stub, so runs need neither a server nor a model download;
+--mongo-url and --model real switch to the real ones. Results are written
+as JSON; --baseline flags routes whose p95 regressed against an earlier run.
+
+Usage: python -m benchmarks.load_test [--scales 10 1000 100000] [--requests 50]
+       [--concurrency 8] [--model stub|real|both] [--baseline results.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+from bson import ObjectId
+
+from app.config import settings
+from app.database import db
+from app.main import app
+from app.models.schemas import MentionCreate
+from app.services.competitor_matrix import competitor_matrix
+from app.services.keywords import keyword_engine
+from app.services.mention_service import MentionService
+from app.services.model_registry import model_registry
+from benchmarks.fakes import install_stub_model, use_in_memory_database
+
+WORDS = [
+    "analytics", "cloud", "secure", "fast", "mobile", "enterprise", "pricing", "support",
+    "integration", "dashboard", "reporting", "automation", "crm", "billing", "api", "ai",
+]
+MENTION_TEMPLATES = [
+    "great {0} and reliable {1}", "slow {0}, terrible {1}", "love the new {0}",
+    "{0} is overpriced but {1} is good", "not happy with {0} support", "{0} works fine",
+]
+# Competitors that get mentions, and the subset with share history; keeps
+# seeding (and the fake's linear scans) from growing with the scale
+SAMPLED_COMPETITORS = 1000
+HISTORY_COMPETITORS = 100
+HISTORY_DAYS = 30
+
+
+def competitor_doc(index: int, rng: random.Random) -> Dict:
+    words = rng.sample(WORDS, 5)
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "name": f"Vendor {index}",
+        "website": f"https://vendor-{index}.example.com",
+        "market_share": round(rng.uniform(0, 30), 2),
+        "price_range": rng.choice(["$", "$$", "$$$"]),
+        "customer_count": f"{rng.randint(1, 500) * 100}+",
+        "strengths": words[:2],
+        "weaknesses": words[2:3],
+        "features": words[3:],
+        "description": f"Vendor {index} offers {' '.join(words)} for segment {index % 40}",
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def competitor_payload(index: int) -> Dict:
+    doc = competitor_doc(index, random.Random(index))
+    return {key: doc[key] for key in (
+        "name", "website", "market_share", "price_range", "customer_count",
+        "strengths", "weaknesses", "description"
+    )}
+
+
+async def seed(database, scale: int, rng: random.Random) -> List[str]:
+    """Insert competitors directly, plus mentions and history for a sample"""
+    ids = []
+    for start in range(0, scale, 5000):
+        docs = [competitor_doc(index, rng) for index in range(start, min(scale, start + 5000))]
+        await database.competitors.insert_many(docs)
+        ids.extend(str(doc["_id"]) for doc in docs)
+
+    sampled = ids[:SAMPLED_COMPETITORS]
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    await database.market_share_history.insert_many([
+        {
+            "competitor_id": competitor_id,
+            "date": today - timedelta(days=day),
+            "market_share": 10 + rng.uniform(-2, 2) + day * 0.01 * (index % 3 - 1),
+            "recorded_at": today,
+        }
+        for index, competitor_id in enumerate(sampled[:HISTORY_COMPETITORS])
+        for day in range(HISTORY_DAYS)
+    ])
+
+    mentions = [
+        MentionCreate(
+            competitor_id=competitor_id,
+            text=rng.choice(MENTION_TEMPLATES).format(*rng.sample(WORDS, 2)),
+            published_at=today - timedelta(days=rng.randint(0, HISTORY_DAYS)),
+        )
+        for competitor_id in sampled
+        for _ in range(5)
+    ]
+    service = MentionService(database)
+    for start in range(0, len(mentions), 2000):
+        await service.ingest_mentions(mentions[start:start + 2000])
+    return ids
+
+
+class Scenario:
+    """One route and a factory producing (method, url, kwargs) for request i"""
+
+    def __init__(self, name: str, make: Callable[[int], tuple], requests: Optional[int] = None,
+                 expected: tuple = (200, 202)):
+        self.name = name
+        self.make = make
+        self.requests = requests
+        self.expected = expected
+
+
+def scenarios(ids: List[str], state: Dict, rng: random.Random, requests: int) -> List[Scenario]:
+    sampled = ids[:SAMPLED_COMPETITORS]
+    with_history = ids[:HISTORY_COMPETITORS]
+    end = datetime.utcnow()
+    window = {"start_date": (end - timedelta(days=HISTORY_DAYS)).isoformat(), "end_date": end.isoformat()}
+
+    def analysis_body(i):
+        return {"competitor_ids": rng.sample(with_history, min(10, len(with_history))), "analysis_type": "full", **window}
+
+    def bulk_rows(i):
+        return [competitor_payload(10_000_000 + i * 100 + row) for row in range(100)]
+
+    def created(i):
+        return state["created"][i % len(state["created"])]
+
+    few = max(1, requests // 10)
+    return [
+        # Competitors: reads first, then writes, deletes last
+        Scenario("GET /api/competitors/", lambda i: ("GET", "/api/competitors/", {"params": {"limit": 100}})),
+        Scenario("GET /api/competitors/ (filtered)", lambda i: (
+            "GET", "/api/competitors/", {"params": {"limit": 50, "min_market_share": 20, "fields": ["name", "market_share"]}}
+        )),
+        Scenario("GET /api/competitors/export", lambda i: (
+            "GET", "/api/competitors/export", {"params": {"min_market_share": 29.5, "fields": ["name"]}}
+        ), requests=few),
+        Scenario("GET /api/competitors/{id}", lambda i: ("GET", f"/api/competitors/{rng.choice(ids)}", {})),
+        Scenario("POST /api/competitors/", lambda i: ("POST", "/api/competitors/", {"json": competitor_payload(20_000_000 + i)})),
+        Scenario("PUT /api/competitors/{id}", lambda i: ("PUT", f"/api/competitors/{created(i)}", {"json": competitor_payload(30_000_000 + i)})),
+        Scenario("POST /api/competitors/bulk", lambda i: ("POST", "/api/competitors/bulk", {"json": bulk_rows(i)}), requests=few),
+        Scenario("POST /api/competitors/bulk/upsert", lambda i: ("POST", "/api/competitors/bulk/upsert", {"json": bulk_rows(i)}), requests=few),
+        # Analysis
+        Scenario("POST /api/analysis/market-analysis", lambda i: ("POST", "/api/analysis/market-analysis", {"json": analysis_body(i)})),
+        Scenario("POST /api/analysis/market-analysis/jobs", lambda i: ("POST", "/api/analysis/market-analysis/jobs", {"json": analysis_body(i)})),
+        Scenario("GET /api/analysis/market-analysis/jobs/{job_id}", lambda i: (
+            "GET", f"/api/analysis/market-analysis/jobs/{state['jobs'][i % len(state['jobs'])]}", {}
+        )),
+        Scenario("GET /api/analysis/market-analysis/jobs/{job_id}/events", lambda i: (
+            "GET", f"/api/analysis/market-analysis/jobs/{state['jobs'][i % len(state['jobs'])]}/events", {}
+        ), requests=few),
+        Scenario("POST /api/analysis/market-share/snapshots", lambda i: ("POST", "/api/analysis/market-share/snapshots", {"json": [
+            {"competitor_id": competitor_id, "date": end.isoformat(), "market_share": rng.uniform(0, 30)}
+            for competitor_id in rng.sample(with_history, min(20, len(with_history)))
+        ]})),
+        Scenario("GET /api/analysis/trends", lambda i: ("GET", "/api/analysis/trends", {})),
+        Scenario("GET /api/analysis/segments", lambda i: ("GET", "/api/analysis/segments", {})),
+        Scenario("POST /api/analysis/competitor-comparison", lambda i: (
+            "POST", "/api/analysis/competitor-comparison", {"json": rng.sample(sampled, min(10, len(sampled)))}
+        )),
+        Scenario("POST /api/analysis/competitor-comparison?mode=set", lambda i: (
+            "POST", "/api/analysis/competitor-comparison", {"json": rng.sample(sampled, min(10, len(sampled))), "params": {"mode": "set"}}
+        )),
+        Scenario("POST /api/analysis/sentiment-analysis/{id}", lambda i: ("POST", f"/api/analysis/sentiment-analysis/{rng.choice(sampled)}", {})),
+        Scenario("GET /api/analysis/reports/{id}", lambda i: ("GET", f"/api/analysis/reports/{rng.choice(sampled)}", {})),
+        Scenario("GET /api/analysis/keywords/{id}", lambda i: ("GET", f"/api/analysis/keywords/{rng.choice(sampled)}", {})),
+        Scenario("GET /api/analysis/embedding-cache/stats", lambda i: ("GET", "/api/analysis/embedding-cache/stats", {})),
+        Scenario("DELETE /api/competitors/{id}", lambda i: ("DELETE", f"/api/competitors/{state['created'][i]}", {})),
+    ]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int,
+                       on_response: Optional[Callable] = None) -> Dict:
+    count = min(scenario.requests or requests, requests)
+    latencies = []
+    failures: Dict[str, int] = {}
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        method, url, kwargs = scenario.make(i)
+        async with slots:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                status = str(response.status_code)
+            except Exception as e:
+                response, status = None, type(e).__name__
+            latencies.append(time.perf_counter() - started)
+        if response is None or response.status_code not in scenario.expected:
+            failures[status] = failures.get(status, 0) + 1
+        elif on_response:
+            on_response(response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    elapsed = time.perf_counter() - started
+    milliseconds = np.array(latencies) * 1000
+    return {
+        "route": scenario.name,
+        "requests": count,
+        "failures": failures,
+        "throughput_rps": count / elapsed if elapsed else None,
+        "p50_ms": float(np.percentile(milliseconds, 50)),
+        "p95_ms": float(np.percentile(milliseconds, 95)),
+        "p99_ms": float(np.percentile(milliseconds, 99)),
+        "max_ms": float(milliseconds.max()),
+    }
+
+
+async def run_scale(scale: int, args, model: str) -> Dict:
+    rng = random.Random(scale)
+    if not args.mongo_url:
+        use_in_memory_database(f"benchmark_{scale}_{model}")
+    else:
+        settings.MONGODB_URL = args.mongo_url
+        settings.DATABASE_NAME = f"benchmark_{scale}_{model}"
+    if model == "stub":
+        install_stub_model()
+    else:
+        model_registry._models.clear()
+
+    report = {"scale": scale, "model": model, "routes": []}
+    async with app.router.lifespan_context(app):
+        database = db.get_database()
+        started = time.perf_counter()
+        ids = await seed(database, scale, rng)
+        report["seed_seconds"] = time.perf_counter() - started
+        print(f"  {scale:>7} {model:<4} seeded in {report['seed_seconds']:.1f}s")
+
+        # Wait for the startup loads so they are not billed to the first routes
+        started = time.perf_counter()
+        await competitor_matrix.ensure_loaded(database.competitors)
+        await keyword_engine.ensure_loaded(database)
+        report["warm_seconds"] = time.perf_counter() - started
+
+        state = {"created": [], "jobs": []}
+        hooks = {
+            "POST /api/competitors/": lambda response: state["created"].append(response.json()["id"]),
+            "POST /api/analysis/market-analysis/jobs": lambda response: state["jobs"].append(response.json()["job_id"]),
+        }
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=args.timeout) as client:
+            for scenario in scenarios(ids, state, rng, args.requests):
+                if "{job_id}" in scenario.name and not state["jobs"]:
+                    continue
+                if scenario.name.startswith(("PUT", "DELETE")) and not state["created"]:
+                    continue
+                result = await run_scenario(
+                    client, scenario,
+                    min(args.requests, len(state["created"])) if scenario.name.startswith("DELETE") else args.requests,
+                    args.concurrency, hooks.get(scenario.name)
+                )
+                report["routes"].append(result)
+                print(f"  {scale:>7} {model:<4} {result['route']:<58} "
+                      f"{result['throughput_rps']:8.1f} rps  p95 {result['p95_ms']:8.1f} ms"
+                      + (f"  failures {result['failures']}" if result["failures"] else ""))
+
+        if args.mongo_url:
+            await db.client.drop_database(settings.DATABASE_NAME)
+    competitor_matrix.__init__()
+    keyword_engine.__init__()
+    return report
+
+
+def compare(report: Dict, baseline_path: str, tolerance: float) -> List[Dict]:
+    """Routes whose p95 grew by more than ``tolerance`` against the baseline"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {
+        (run["scale"], run["model"], route["route"]): route["p95_ms"]
+        for run in baseline["runs"] for route in run["routes"]
+    }
+    regressions = []
+    for run in report["runs"]:
+        for route in run["routes"]:
+            before = previous.get((run["scale"], run["model"], route["route"]))
+            if before and route["p95_ms"] > before * (1 + tolerance):
+                regressions.append({
+                    "scale": run["scale"], "model": run["model"], "route": route["route"],
+                    "baseline_p95_ms": before, "p95_ms": route["p95_ms"],
+                })
+    return regressions
+
+
+async def main_async(args):
+    models = ["stub", "real"] if args.model == "both" else [args.model]
+    report = {
+        "started_at": datetime.utcnow().isoformat(),
+        "backend": args.mongo_url or "mongomock",
+        "requests_per_route": args.requests,
+        "concurrency": args.concurrency,
+        "runs": [],
+    }
+    for model in models:
+        for scale in args.scales:
+            report["runs"].append(await run_scale(scale, args, model))
+
+    if args.baseline:
+        report["regressions"] = compare(report, args.baseline, args.tolerance)
+
+    output = args.output or os.path.join(
+        "benchmarks", "results", f"load_test_{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    if report.get("regressions"):
+        print(json.dumps(report["regressions"], indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--requests", type=int, default=50, help="Requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--model", choices=["stub", "real", "both"], default="stub")
+    parser.add_argument("--mongo-url", default=None, help="Use a real MongoDB instead of the in-memory fake")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None, help="Earlier results file to compare p95 against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 growth before flagging")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -88,6 +88,46 @@ export class APIError extends Error {
     }
 }
 
+async function errorFromResponse(response: Response): Promise<APIError> {
+    let errorMessage = `API Error: ${response.status}`;
+    try {
+        const errorData = await response.json();
+        errorMessage = errorData.detail || errorMessage;
+    } catch {
+        errorMessage += ` - ${response.statusText}`;
+    }
+    return new APIError(response.status, errorMessage);
+}
+
+// List endpoints are keyset-paginated: follow X-Next-Cursor until the last page
+async function fetchAllPages<T>(endpoint: string, pageSize = 1000): Promise<T[]> {
+    const items: T[] = [];
+    let cursor: string | null = null;
+
+    try {
+        do {
+            const params = new URLSearchParams({ limit: String(pageSize) });
+            if (cursor) params.set('after', cursor);
+            const response = await fetch(`${API_BASE_URL}${endpoint}?${params}`, {
+                headers: { Accept: 'application/json' },
+            });
+            if (!response.ok) {
+                throw await errorFromResponse(response);
+            }
+            items.push(...(await response.json()));
+            cursor = response.headers.get('X-Next-Cursor');
+        } while (cursor);
+    } catch (error) {
+        if (error instanceof APIError) throw error;
+        throw new APIError(
+            500,
+            error instanceof Error ? error.message : 'An unexpected error occurred'
+        );
+    }
+
+    return items;
+}
+
 async function fetchAPI<T>(endpoint: string, options: RequestInit = {}): Promise<T> {
     const url = `${API_BASE_URL}${endpoint}`;
     const cacheKey = options.method === 'GET' ? url : null;
@@ -108,14 +148,7 @@ async function fetchAPI<T>(endpoint: string, options: RequestInit = {}): Promise
         });
 
         if (!response.ok) {
-            let errorMessage = `API Error: ${response.status}`;
-            try {
-                const errorData = await response.json();
-                errorMessage = errorData.detail || errorMessage;
-            } catch {
-                errorMessage += ` - ${response.statusText}`;
-            }
-            throw new APIError(response.status, errorMessage);
+            throw await errorFromResponse(response);
         }
 
         const data = await response.json();
@@ -137,7 +170,7 @@ async function fetchAPI<T>(endpoint: string, options: RequestInit = {}): Promise
 export const api = {
     competitors: {
         getAll: (): Promise<Competitor[]> =>
-            fetchAPI('/competitors/'),
+            fetchAllPages<Competitor>('/competitors/'),
 
         getById: (id: string): Promise<Competitor> =>
             fetchAPI(`/competitors/${id}/`),